@@ -0,0 +1,336 @@
+"""Load-test / benchmark runner for skycast_core and skycast_core_advance.
+
+Boots the local OpenWeatherMap stub (stub_owm.py) and each app under uvicorn, seeds the
+advance app's history to the requested size, then drives every scenario with a fixed
+number of requests at a fixed concurrency. Results (throughput, latency percentiles,
+status codes and upstream calls per scenario) are written as JSON; pass a previous
+result file as --baseline to get per-scenario throughput and p95 changes.
+
+    python benchmarks/run.py --concurrency 32 --requests 1000 --records 20000 --output bench.json
+    python benchmarks/run.py --apps advance --scenarios export_pdf,create_range --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIRS = {"core": "skycast_core", "advance": "skycast_core_advance"}
+
+
+def _location(i, opts):
+    return f"Benchcity{i % opts.locations}"
+
+
+def _range_params(i, opts):
+    start = date.today() + timedelta(days=i % 30)
+    return {"location": _location(i, opts), "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=opts.range_days - 1)).isoformat()}
+
+
+# (method, path, params(i, opts)) per scenario; i is the request number
+SCENARIOS = {
+    "core": {
+        "weather": ("GET", "/weather", lambda i, opts: {"location": _location(i, opts)}),
+        "forecast": ("GET", "/forecast", lambda i, opts: {"location": _location(i, opts)}),
+    },
+    # read-only scenarios first, so exports see one history version; writers last
+    "advance": {
+        "records": ("GET", "/records", lambda i, opts: {"limit": 100}),
+        "history": ("GET", "/history/", lambda i, opts: {"limit": 100, "city": _location(i, opts)}),
+        "export_csv": ("GET", "/export/csv", lambda i, opts: {}),
+        "export_json": ("GET", "/export/json", lambda i, opts: {}),
+        "export_pdf": ("GET", "/export/pdf", lambda i, opts: {}),
+        "weather": ("GET", "/weather", lambda i, opts: {"location": _location(i, opts)}),
+        "forecast": ("GET", "/forecast", lambda i, opts: {"location": _location(i, opts)}),
+        "create_range": ("POST", "/create_range", _range_params),
+    },
+}
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, process, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def _start_stub(opts):
+    port = _free_port()
+    cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "stub_owm.py"), "--port", str(port),
+           "--latency-ms", str(opts.latency_ms), "--jitter-ms", str(opts.jitter_ms), "--error-rate", str(opts.error_rate)]
+    process = subprocess.Popen(cmd)
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_ready(base_url + "/__stats", process)
+    return process, base_url
+
+
+def _start_app(name: str, stub_url: str, workdir: str):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "OPENWEATHER_BASE_URL": stub_url,
+        "OPENWEATHER_API_KEY": "benchmark",
+        # the stub has no quota; the limiter would otherwise dominate every result
+        "UPSTREAM_RATE_PER_MINUTE": "0",
+        # background refreshes would make runs depend on timing
+        "WARMER_ENABLED": "false",
+        "DB_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "EXPORT_DIR": os.path.join(workdir, "exports"),
+    })
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning"]
+    process = subprocess.Popen(cmd, cwd=os.path.join(ROOT, APP_DIRS[name]), env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    _wait_ready(base_url + "/", process)
+    return process, base_url
+
+
+def _stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def _seed(base_url: str, opts):
+    """Grow the advance app's history to `opts.records` rows with create_range (365 rows per call)."""
+    remaining, i = opts.records, 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        while remaining > 0:
+            days = min(365, remaining)
+            start = date(2000, 1, 1) + timedelta(days=365 * i)
+            params = {"location": _location(i, opts), "start_date": start.isoformat(),
+                      "end_date": (start + timedelta(days=days - 1)).isoformat()}
+            response = await client.post("/create_range", params=params)
+            if response.status_code != 200 or response.json().get("error"):
+                raise RuntimeError(f"Seeding failed: {response.status_code} {response.text[:200]}")
+            remaining -= days
+            i += 1
+
+
+async def _drive(base_url: str, method: str, path: str, params, total: int, concurrency: int, opts):
+    """Send `total` requests from `concurrency` workers; returns (latencies in s, status counter, wall time)."""
+    latencies, statuses = [], Counter()
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=opts.timeout, limits=limits) as client:
+        async def worker():
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, params=params(i, opts))
+                    status = response.status_code
+                    # the services answer failed lookups with 200 and {"error": true, ...}
+                    if response.content.startswith(b'{"error":true'):
+                        status = f"{status}:error"
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, statuses, time.perf_counter() - started
+
+
+def _upstream_calls(stub_url: str):
+    """(calls, 500 answers) the stub has served so far."""
+    calls = httpx.get(stub_url + "/__stats").json()["calls"]
+    errors = sum(n for name, n in calls.items() if name.endswith("_errors"))
+    return sum(calls.values()) - errors, errors
+
+
+def _summarize(app: str, scenario: str, latencies, statuses, wall: float, upstream, opts):
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 400)
+    return {
+        "app": app,
+        "scenario": scenario,
+        "requests": len(latencies),
+        "concurrency": opts.concurrency,
+        "duration_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(ms.max()), 2),
+        },
+        "errors": errors,
+        "status_codes": {str(status): n for status, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        "upstream_calls": upstream[0],
+        "upstream_errors": upstream[1],
+    }
+
+
+async def _bench_app(app: str, base_url: str, stub_url: str, opts):
+    results = []
+    if app == "advance" and opts.records:
+        _log(f"[{app}] seeding {opts.records} records")
+        await _seed(base_url, opts)
+    for scenario, (method, path, params) in SCENARIOS[app].items():
+        if opts.scenarios and scenario not in opts.scenarios:
+            continue
+        total = opts.requests_per_scenario.get(scenario, opts.requests)
+        if opts.warmup:
+            await _drive(base_url, method, path, params, opts.warmup, opts.concurrency, opts)
+        before = _upstream_calls(stub_url)
+        latencies, statuses, wall = await _drive(base_url, method, path, params, total, opts.concurrency, opts)
+        after = _upstream_calls(stub_url)
+        upstream = (after[0] - before[0], after[1] - before[1])
+        result = _summarize(app, scenario, latencies, statuses, wall, upstream, opts)
+        _log(f"[{app}] {scenario}: {result['throughput_rps']} req/s, p95 {result['latency_ms']['p95']} ms, "
+             f"{result['errors']} errors")
+        results.append(result)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _change(new: float, old: float):
+    return None if not old else round((new - old) / old * 100, 2)
+
+
+def compare(results, baseline):
+    """Per-scenario % change in throughput and p95/p99 against a previous run's results."""
+    previous = {(r["app"], r["scenario"]): r for r in baseline.get("results", [])}
+    out = []
+    for r in results:
+        old = previous.get((r["app"], r["scenario"]))
+        if old is None:
+            continue
+        out.append({
+            "app": r["app"],
+            "scenario": r["scenario"],
+            "throughput_change_pct": _change(r["throughput_rps"], old["throughput_rps"]),
+            "p95_change_pct": _change(r["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            "p99_change_pct": _change(r["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+        })
+    return out
+
+
+def run(opts):
+    stub, stub_url = _start_stub(opts)
+    results = []
+    try:
+        for app in opts.apps:
+            with tempfile.TemporaryDirectory(prefix=f"skycast-bench-{app}-") as workdir:
+                process, base_url = _start_app(app, stub_url, workdir)
+                try:
+                    results.extend(asyncio.run(_bench_app(app, base_url, stub_url, opts)))
+                finally:
+                    _stop(process)
+    finally:
+        _stop(stub)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {
+                "apps": opts.apps, "concurrency": opts.concurrency, "requests": opts.requests,
+                "requests_per_scenario": opts.requests_per_scenario, "warmup": opts.warmup,
+                "locations": opts.locations, "records": opts.records, "range_days": opts.range_days,
+                "latency_ms": opts.latency_ms, "jitter_ms": opts.jitter_ms, "error_rate": opts.error_rate,
+            },
+        },
+        "results": results,
+    }
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            report["comparison"] = compare(results, json.load(f))
+    return report
+
+
+def _per_scenario(value: str):
+    """"export_pdf=20,create_range=50" -> {"export_pdf": 20, "create_range": 50}"""
+    out = {}
+    for item in filter(None, value.split(",")):
+        name, _, n = item.partition("=")
+        out[name.strip()] = int(n)
+    return out
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--apps", type=lambda v: v.split(","), default=list(APP_DIRS),
+                        help="comma-separated: core,advance")
+    parser.add_argument("--scenarios", type=lambda v: set(v.split(",")), default=None,
+                        help="comma-separated subset, e.g. weather,export_pdf (default: all)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--requests-per-scenario", type=_per_scenario, default={},
+                        help="overrides, e.g. export_pdf=20,create_range=50")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--locations", type=int, default=50, help="distinct locations cycled through")
+    parser.add_argument("--records", type=int, default=5000, help="history rows seeded into the advance app")
+    parser.add_argument("--range-days", type=int, default=7, help="days per create_range request")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean stub upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub answers that are 500s")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request client timeout in seconds")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    opts = parser.parse_args(argv)
+    unknown = set(opts.apps) - set(APP_DIRS)
+    if unknown:
+        parser.error(f"unknown app(s): {', '.join(sorted(unknown))}")
+    return opts
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+    report = run(opts)
+    text = json.dumps(report, indent=2)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(text + "\n")
+        _log(f"wrote {opts.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Local stand-in for the OpenWeatherMap 2.5 API, used by the benchmark suite.
+
+Serves `/weather` and `/forecast` with payloads shaped like OWM's (every field the apps
+read, plus the usual extras), deterministic per location so runs are comparable.
+Response latency (mean and jitter, in ms) and the share of 500 answers are configurable,
+so benchmarks can model a fast, slow or flaky upstream. `/__stats` reports how many
+calls each endpoint received.
+
+    python benchmarks/stub_owm.py --port 8900 --latency-ms 80 --jitter-ms 20 --error-rate 0.01
+
+Point an app at it with OPENWEATHER_BASE_URL=http://127.0.0.1:8900.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CONDITIONS = [
+    (800, "Clear", "clear sky", "01d"),
+    (801, "Clouds", "few clouds", "02d"),
+    (802, "Clouds", "scattered clouds", "03d"),
+    (804, "Clouds", "overcast clouds", "04d"),
+    (500, "Rain", "light rain", "10d"),
+    (501, "Rain", "moderate rain", "10d"),
+    (600, "Snow", "light snow", "13d"),
+    (701, "Mist", "mist", "50d"),
+]
+SLOT_SECONDS = 3 * 60 * 60
+FORECAST_SLOTS = 40
+
+settings = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "50")),
+    "jitter_ms": float(os.getenv("STUB_JITTER_MS", "10")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+}
+calls = Counter()
+
+app = FastAPI(title="OpenWeatherMap stub")
+
+
+def _location(params):
+    """(display name, stable seed) for the q / id / zip / lat+lon query parameters."""
+    if "lat" in params and "lon" in params:
+        lat, lon = round(float(params["lat"]), 2), round(float(params["lon"]), 2)
+        return f"Place {lat},{lon}", f"coords:{lat},{lon}"
+    if "id" in params:
+        return f"City {params['id']}", f"id:{params['id']}"
+    if "zip" in params:
+        return f"Zip {params['zip'].split(',')[0]}", f"zip:{params['zip'].casefold()}"
+    name = params.get("q", "Unknown").split(",")[0].strip()
+    return name.title(), f"city:{name.casefold()}"
+
+
+def _rng(seed: str):
+    return random.Random(int.from_bytes(hashlib.blake2b(seed.encode(), digest_size=8).digest(), "little"))
+
+
+def _condition(rng):
+    code, main, description, icon = rng.choice(CONDITIONS)
+    return [{"id": code, "main": main, "description": description, "icon": icon}]
+
+
+def _main(rng, base_temp: float):
+    temp = round(base_temp + rng.uniform(-3, 3), 2)
+    return {
+        "temp": temp,
+        "feels_like": round(temp - rng.uniform(0, 2), 2),
+        "temp_min": round(temp - rng.uniform(0, 2), 2),
+        "temp_max": round(temp + rng.uniform(0, 2), 2),
+        "pressure": rng.randint(990, 1030),
+        "humidity": rng.randint(20, 95),
+    }
+
+
+def _coord(rng):
+    return {"lat": round(rng.uniform(-60, 70), 4), "lon": round(rng.uniform(-180, 180), 4)}
+
+
+def weather_payload(params):
+    name, seed = _location(params)
+    rng = _rng(seed)
+    base_temp, coord, city_id = rng.uniform(-5, 35), _coord(rng), rng.randint(100000, 9999999)
+    now = int(time.time())
+    return {
+        "coord": coord,
+        "weather": _condition(rng),
+        "base": "stations",
+        "main": _main(rng, base_temp),
+        "visibility": 10000,
+        "wind": {"speed": round(rng.uniform(0, 12), 2), "deg": rng.randint(0, 359)},
+        "clouds": {"all": rng.randint(0, 100)},
+        "dt": now,
+        "sys": {"country": "XX", "sunrise": now - 6 * 3600, "sunset": now + 6 * 3600},
+        "timezone": 0,
+        "id": city_id,
+        "name": name,
+        "cod": 200,
+    }
+
+
+def forecast_payload(params):
+    name, seed = _location(params)
+    rng = _rng(seed)
+    base_temp, coord, city_id = rng.uniform(-5, 35), _coord(rng), rng.randint(100000, 9999999)
+    first = (int(time.time()) // SLOT_SECONDS + 1) * SLOT_SECONDS
+    slots = []
+    for i in range(FORECAST_SLOTS):
+        dt = first + i * SLOT_SECONDS
+        slots.append({
+            "dt": dt,
+            "main": _main(rng, base_temp),
+            "weather": _condition(rng),
+            "clouds": {"all": rng.randint(0, 100)},
+            "wind": {"speed": round(rng.uniform(0, 12), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0, 18), 2)},
+            "visibility": 10000,
+            "pop": round(rng.random(), 2),
+            "sys": {"pod": "d" if 6 <= (dt // 3600) % 24 < 18 else "n"},
+            "dt_txt": datetime.fromtimestamp(dt, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": len(slots),
+        "list": slots,
+        "city": {"id": city_id, "name": name, "coord": coord, "country": "XX", "timezone": 0,
+                 "sunrise": first - 6 * 3600, "sunset": first + 6 * 3600},
+    }
+
+
+async def _respond(endpoint: str, request: Request, build):
+    calls[endpoint] += 1
+    delay = random.gauss(settings["latency_ms"], settings["jitter_ms"]) if settings["jitter_ms"] else settings["latency_ms"]
+    await asyncio.sleep(max(0.0, delay) / 1000)
+    if random.random() < settings["error_rate"]:
+        calls[endpoint + "_errors"] += 1
+        return JSONResponse(status_code=500, content={"cod": 500, "message": "stub upstream error"})
+    return build(request.query_params)
+
+
+@app.get("/weather")
+async def weather(request: Request):
+    return await _respond("weather", request, weather_payload)
+
+
+@app.get("/forecast")
+async def forecast(request: Request):
+    return await _respond("forecast", request, forecast_payload)
+
+
+@app.get("/__stats")
+def stats():
+    return {"calls": dict(calls), **settings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    args = parser.parse_args()
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
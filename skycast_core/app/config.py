@@ -5,7 +5,77 @@ import os
 load_dotenv()  # Load environment variables from .env file
 
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-BASE_URL = "https://api.openweathermap.org/data/2.5"
+BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+
+# Upstream HTTP client pool (shared by every OpenWeatherMap call)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+
+# Upstream quota: token bucket shared by every OpenWeatherMap call (rate 0 disables it)
+UPSTREAM_RATE_PER_MINUTE = float(os.getenv("UPSTREAM_RATE_PER_MINUTE", "60"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "10"))
+# Tokens bulk work (batch endpoints, date ranges) must leave for interactive lookups
+UPSTREAM_INTERACTIVE_RESERVE = int(os.getenv("UPSTREAM_INTERACTIVE_RESERVE", "2"))
+# Seconds a call may queue for a token before the API answers 429
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "2"))
+UPSTREAM_BULK_MAX_WAIT = float(os.getenv("UPSTREAM_BULK_MAX_WAIT", "30"))
+
+# Circuit breaker: consecutive upstream failures before calls fail fast, seconds until a trial call
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+# Stale-while-revalidate: expired payloads are still served (flagged stale) for this long
+# while one background refresh runs; cache misses wait at most UPSTREAM_DEADLINE seconds
+CACHE_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", "3600"))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "4"))
+# Threads running upstream calls for cache misses (single-flight leaders only) and,
+# separately, for background refreshes of stale entries
+UPSTREAM_FETCH_WORKERS = int(os.getenv("UPSTREAM_FETCH_WORKERS", "16"))
+UPSTREAM_REFRESH_WORKERS = int(os.getenv("UPSTREAM_REFRESH_WORKERS", "4"))
+
+# Cache warmer: refresh the WARMER_TOP_N most requested locations WARMER_LEAD seconds before they expire,
+# checking every WARMER_INTERVAL seconds and spending at most WARMER_QUOTA_SHARE of the upstream quota
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "true").lower() == "true"
+WARMER_TOP_N = int(os.getenv("WARMER_TOP_N", "50"))
+WARMER_INTERVAL = float(os.getenv("WARMER_INTERVAL", "15"))
+WARMER_LEAD = float(os.getenv("WARMER_LEAD", "60"))
+WARMER_QUOTA_SHARE = float(os.getenv("WARMER_QUOTA_SHARE", "0.2"))
+WARMER_WORKERS = int(os.getenv("WARMER_WORKERS", "2"))
+# Popularity counts are halved this often so the hot set follows current traffic
+WARMER_DECAY_INTERVAL = float(os.getenv("WARMER_DECAY_INTERVAL", "600"))
+
+# Per-request profiling (opt-in): requests with `X-Profile: 1` or `?profile=1` and a matching
+# `X-Admin-Token` are sampled every PROFILING_INTERVAL_MS and saved to PROFILING_DIR as speedscope files
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "50"))
+
+# Current-weather response cache
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))
+
+# Forecast cache: entries expire at the next 3-hour forecast slot, only the size is tunable
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "1024"))
+
+# Batch endpoints: max locations per request and concurrent upstream calls
+BATCH_MAX_LOCATIONS = int(os.getenv("BATCH_MAX_LOCATIONS", "200"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+# IP geolocation fallback for requests without a location
+GEOIP_CSV_PATH = os.getenv("GEOIP_CSV_PATH")  # optional offline IP-range table
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "10000"))
+GEOIP_CACHE_TTL = float(os.getenv("GEOIP_CACHE_TTL", "86400"))
+GEOIP_REMOTE_TIMEOUT = float(os.getenv("GEOIP_REMOTE_TIMEOUT", "1.5"))
+# X-Forwarded-For is client-controlled: honour it only behind a proxy that overwrites it
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+# Offline gazetteer (OWM city.list.json, optionally .gz) for location resolution and autocomplete
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH")
 
 
 def get_masked_api_key():
@@ -1,10 +1,46 @@
-from fastapi import FastAPI
-from app.routes import weather_routes, forecast_routes
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.routes import weather_routes, forecast_routes, location_routes, stats_routes, metrics_routes, profile_routes
+from app.utils import http_client, gazetteer, geolocation, profiling
+from app.utils.cache_warmer import warmer
+from app.utils.metrics import MetricsMiddleware
+from app.utils.scheduler import UpstreamThrottled
 
-app = FastAPI(title="SkyCast Core")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pooled upstream client for the whole app lifetime
+    http_client.startup()
+    geolocation.load_ip_ranges()
+    gazetteer.load_gazetteer()
+    warmer.start()
+    yield
+    warmer.stop()
+    await http_client.shutdown()
+
+
+app = FastAPI(title="SkyCast Core", lifespan=lifespan)
+# per-route request counts and latency for /metrics
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(weather_routes.router)
 app.include_router(forecast_routes.router)
+app.include_router(location_routes.router)
+app.include_router(stats_routes.router)
+app.include_router(metrics_routes.router)
+
+# opt-in per-request profiling: neither the middleware nor /profiles exist unless enabled
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+    app.include_router(profile_routes.router)
+
+# upstream quota exhausted: tell the client when to retry instead of failing the lookup
+@app.exception_handler(UpstreamThrottled)
+async def upstream_throttled(request: Request, exc: UpstreamThrottled):
+    return JSONResponse(status_code=429, content={"error": True, "message": str(exc)},
+                        headers={"Retry-After": str(math.ceil(exc.retry_after))})
 
 @app.get("/")
 def root():
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Query
 from app.services.forecast_service import get_forecast_data
+from app.utils.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/forecast")
-async def get_forecast(location: str = Query(..., description="City name or ZIP code")):
-    forecast = await get_forecast_data(location)
+async def get_forecast(location: str = Query(..., description="City name or ZIP code"),
+                       detail: str = Query("daily", description="daily (per-day min/max/mean) or hourly (3-hour slots)")):
+    forecast = await get_forecast_data(location, detail)
     return forecast
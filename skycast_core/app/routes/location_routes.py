@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Query
+from app.utils import gazetteer
+from app.utils.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/locations", route_class=ProfiledRoute)
+
+@router.get("/suggest")
+def suggest_locations(prefix: str = Query(..., min_length=1, description="Start of a city name"),
+                      limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete city names from the in-memory gazetteer (no upstream call)."""
+    return {"suggestions": gazetteer.suggest(prefix, limit)}
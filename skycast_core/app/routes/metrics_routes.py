@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response
+from app.services import forecast_service
+from app.services.weather_service import weather_cache, forecast_cache
+from app.utils.metrics import CONTENT_TYPE, REGISTRY, cache_families
+
+router = APIRouter()
+
+_caches = {
+    "weather": weather_cache,
+    "forecast": forecast_cache,
+    "async_forecast": forecast_service.forecast_cache,
+}
+REGISTRY.add_collector(lambda: cache_families(_caches))
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
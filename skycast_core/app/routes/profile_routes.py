@@ -0,0 +1,32 @@
+import os
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+from app import config
+from app.utils.profiling import SUFFIX, is_admin
+
+router = APIRouter(prefix="/profiles")
+
+
+def _require_admin(token: str):
+    if not is_admin(token):
+        raise HTTPException(status_code=403, detail="A valid admin token is required.")
+
+
+@router.get("")
+def list_profiles(x_admin_token: str = Header(None)):
+    """Stored request profiles, newest first."""
+    _require_admin(x_admin_token)
+    if not os.path.isdir(config.PROFILING_DIR):
+        return {"profiles": []}
+    names = sorted((n for n in os.listdir(config.PROFILING_DIR) if n.endswith(SUFFIX)), reverse=True)
+    return {"profiles": names}
+
+
+@router.get("/{name}")
+def download_profile(name: str, x_admin_token: str = Header(None)):
+    """One speedscope profile, by the name returned in the X-Profile header."""
+    _require_admin(x_admin_token)
+    path = os.path.join(config.PROFILING_DIR, name)
+    if os.path.basename(name) != name or not name.endswith(SUFFIX) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="application/json", filename=name)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from app.services import forecast_service
+from app.services.weather_service import weather_cache, forecast_cache
+from app.utils import resilience
+from app.utils.cache_warmer import warmer
+from app.utils.circuit_breaker import upstream_breaker
+from app.utils.scheduler import scheduler
+from app.utils.singleflight import upstream_flight, async_upstream_flight
+
+router = APIRouter()
+
+@router.get("/stats")
+def read_stats():
+    """Cache and coalescing counters, useful to see how much upstream traffic is being saved."""
+    return {
+        "weather_cache": weather_cache.stats(),
+        "forecast_cache": forecast_cache.stats(),
+        "async_forecast_cache": forecast_service.forecast_cache.stats(),
+        "coalesced_requests": upstream_flight.coalesced + async_upstream_flight.coalesced,
+        "upstream_scheduler": scheduler.stats(),
+        "upstream_breaker": upstream_breaker.stats(),
+        "deadline_misses": resilience.deadline_misses.value(),
+        "cache_warmer": warmer.stats(),
+    }
@@ -1,26 +1,49 @@
-from fastapi import APIRouter, Query
-from app.services.weather_service import get_current_weather, get_forecast
-from app.utils.geolocation import get_location_from_ip
+from fastapi import APIRouter, Query, Request
+from app.services.weather_service import (
+    get_current_weather, get_forecast, get_current_weather_batch, get_forecast_batch
+)
+from app.utils.batch import LocationBatch
+from app.utils.geolocation import client_ip, get_location_from_ip
+from app.utils.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/weather")
-def read_weather(location: str = Query(None, description="City name or ZIP code")):
+def read_weather(request: Request, location: str = Query(None, description="City name or ZIP code")):
     """
     Fetch current weather data for a given location.
-    If no location is provided, attempt to determine via IP.
+    If no location is provided, attempt to determine via the caller's IP.
     """
     if not location:
-        location = get_location_from_ip()
+        location = get_location_from_ip(client_ip(request))
     return get_current_weather(location)
 
 
+@router.post("/weather/batch")
+def read_weather_batch(batch: LocationBatch):
+    """
+    Fetch current weather for many locations (city, ZIP or coordinates) in one call.
+    Each result carries its own error flag.
+    """
+    return get_current_weather_batch(batch.locations)
+
+
 @router.get("/forecast")
-def read_forecast(location: str = Query(None, description="City name or ZIP code")):
+def read_forecast(request: Request, location: str = Query(None, description="City name or ZIP code"),
+                  detail: str = Query("daily", description="daily (per-day min/max/mean) or hourly (3-hour slots)")):
     """
     Fetch 5-day weather forecast for a given location.
-    If no location is provided, attempt to determine via IP.
+    If no location is provided, attempt to determine via the caller's IP.
     """
     if not location:
-        location = get_location_from_ip()
-    return get_forecast(location)
+        location = get_location_from_ip(client_ip(request))
+    return get_forecast(location, detail)
+
+
+@router.post("/forecast/batch")
+def read_forecast_batch(batch: LocationBatch):
+    """
+    Fetch 5-day forecasts for many locations (city, ZIP or coordinates) in one call.
+    Each result carries its own error flag.
+    """
+    return get_forecast_batch(batch.locations)
@@ -1,31 +1,37 @@
-import os, httpx
-from dotenv import load_dotenv
+import httpx
+from app import config
+from app.services.weather_service import build_url, location_key
+from app.utils.cache import TTLCache, next_slot_expiry
+from app.utils.forecast_aggregate import DETAILS, aggregate
+from app.utils.http_client import get_async_client
+from app.utils.resilience import serve_async, stale_fields
 
 
-load_dotenv()  # Load environment variables from .env file
-API_KEY = os.getenv("OPENWEATHER_API_KEY")
+# Aggregated daily/hourly views, valid until OWM publishes the next 3-hour forecast slot
+forecast_cache = TTLCache(maxsize=config.FORECAST_CACHE_SIZE, stale_ttl=config.CACHE_STALE_TTL)
 
 
-async def get_forecast_data(location: str):
-    base_url = "https://api.openweathermap.org/data/2.5/forecast"
-    params = {"q": location, "appid": API_KEY, "units": "metric"}
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(base_url, params=params, timeout=10)
-    
-    if response.status_code == 200:
+async def get_forecast_data(location: str, detail: str = "daily"):
+    if detail not in DETAILS:
+        return {"error": True, "message": f"detail must be one of: {', '.join(DETAILS)}"}
+    key = location_key(location)
+    views, age = await serve_async(forecast_cache, key, "forecast:" + key, _fetch_forecast_data, location, key)
+    if views is None:
         return {"error": True, "message": "Invalid location or API error"}
-    
-    data = response.json()
+    return {"error": False, "forecast": views[detail], **stale_fields(age)}
 
 
-    daily = []
-    for i in range(0, len(data["list"]), 8):
-        item = data['list'][i]
-        daily.append({
-            "date": item["dt_txt"].split(" ")[0],
-            "temp": item["main"]["temp"],
-            "description": item["weather"][0]["description"]
-        })
+async def _fetch_forecast_data(location: str, key: str):
+    try:
+        response = await get_async_client().get(build_url("/forecast", location))
+    except httpx.HTTPError:
+        return None
 
-    return {"error": False, "forecast": daily}
\ No newline at end of file
+    if response.status_code != 200:
+        return None
+
+    data = response.json()
+    # all 40 slots feed the daily view, not just every 8th one
+    views = aggregate(data["list"])
+    forecast_cache.set(key, views, expires_at=next_slot_expiry(data["list"]))
+    return views
@@ -1,61 +1,146 @@
-import requests
 import os
+import httpx
 from dotenv import load_dotenv
+from app import config
+from app.utils.batch import batch_response, fan_out
+from app.utils import gazetteer
+from app.utils.cache import TTLCache, next_slot_expiry
+from app.utils.cache_warmer import warmer
+from app.utils.forecast_aggregate import DETAILS, aggregate
+from app.utils.http_client import get_client
+from app.utils.resilience import serve, stale_fields
+from app.utils.scheduler import BULK, upstream_priority
 
 load_dotenv()
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
+# OWM refreshes observations roughly every 10 minutes, so recent payloads are reused
+weather_cache = TTLCache(maxsize=config.WEATHER_CACHE_SIZE, ttl=config.WEATHER_CACHE_TTL, stale_ttl=config.CACHE_STALE_TTL)
+# Aggregated daily/hourly views, valid until OWM publishes the next 3-hour forecast slot
+forecast_cache = TTLCache(maxsize=config.FORECAST_CACHE_SIZE, stale_ttl=config.CACHE_STALE_TTL)
 
-def build_url(base_url: str, location: str):
+
+def parse_location(location: str):
     """
-    Detects input type (city, ZIP, or coordinates) and builds the correct OpenWeatherMap API URL.
+    Detects input type and returns ("coords", (lat, lon)), ("id", city_id), ("zip", zip) or ("city", name).
+    Names known to the offline gazetteer resolve to their canonical OpenWeatherMap city id.
     """
     # GPS coordinates check (e.g. "31.5497,74.3436")
     if "," in location:
         parts = [p.strip() for p in location.split(",")]
         if len(parts) == 2 and all(x.replace('.', '', 1).replace('-', '', 1).isdigit() for x in parts):
             lat, lon = map(float, parts)
-            return f"{base_url}?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
+            return "coords", (lat, lon)
+
+    # Known city, optionally with state / country (e.g. "London,GB")
+    city = gazetteer.resolve(location)
+    if city is not None:
+        return "id", city[0]
 
     # ZIP code with country (e.g. "94040,US")
     if location.replace(",", "").replace("-", "").isdigit() or "," in location:
-        return f"{base_url}?zip={location}&appid={API_KEY}&units=metric"
+        return "zip", location
 
     # Default: treat as city or landmark
-    return f"{base_url}?q={location}&appid={API_KEY}&units=metric"
+    return "city", location
+
+
+def build_url(base_url: str, location: str):
+    """
+    Detects input type (city, ZIP, or coordinates) and builds the correct OpenWeatherMap API URL.
+    `base_url` may be a path relative to the shared upstream client's base URL (e.g. "/weather").
+    """
+    kind, value = parse_location(location)
+    if kind == "coords":
+        lat, lon = value
+        return f"{base_url}?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
+    if kind == "id":
+        return f"{base_url}?id={value}&appid={API_KEY}&units=metric"
+    if kind == "zip":
+        return f"{base_url}?zip={value}&appid={API_KEY}&units=metric"
+    return f"{base_url}?q={value}&appid={API_KEY}&units=metric"
+
+
+def location_key(location: str):
+    """
+    Normalized cache key for a location: canonical city id when the gazetteer knows it,
+    else case-folded city / ZIP, coordinates rounded to 2 decimals (~1 km) so
+    near-identical GPS inputs share an entry.
+    """
+    kind, value = parse_location(location.strip())
+    if kind == "coords":
+        lat, lon = value
+        return f"coords:{round(lat, 2)},{round(lon, 2)}"
+    if kind == "id":
+        return f"id:{value}"
+    return kind + ":" + ",".join(" ".join(part.split()) for part in value.casefold().split(","))
 
 
 def get_current_weather(location: str):
-    base_url = "https://api.openweathermap.org/data/2.5/weather"
-    url = build_url(base_url, location)
-    response = requests.get(url)
+    key = location_key(location)
+    warmer.track("weather", key, location)
+    # fresh hit, else stale copy + background refresh, else one coalesced upstream call
+    data, age = serve(weather_cache, key, "weather:" + key, _fetch_current_weather, location, key)
+    if data is None:
+        return {"error": True, "message": "Failed to fetch current weather"}
+    return {"error": False, "data": data, **stale_fields(age)}
+
+
+def _fetch_current_weather(location: str, key: str):
+    url = build_url("/weather", location)
+    try:
+        response = get_client().get(url)
+    except httpx.HTTPError:
+        return None
 
     if response.status_code != 200:
-        return {"error": True, "message": "Failed to fetch current weather"}
+        return None
 
-    return {"error": False, "data": response.json()}
+    data = response.json()
+    weather_cache.set(key, data)
+    return data
+
+
+def get_forecast(location: str, detail: str = "daily"):
+    """5-day forecast aggregated per day (`detail="daily"`) or as the raw 3-hour slots ("hourly")."""
+    if detail not in DETAILS:
+        return {"error": True, "message": f"detail must be one of: {', '.join(DETAILS)}"}
+    key = location_key(location)
+    warmer.track("forecast", key, location)
+    views, age = serve(forecast_cache, key, "forecast:" + key, _fetch_forecast, location, key)
+    if views is None:
+        return {"error": True, "message": "Failed to fetch forecast"}
+    return {"error": False, "forecast": views[detail], **stale_fields(age)}
 
 
-def get_forecast(location: str):
-    base_url = "https://api.openweathermap.org/data/2.5/forecast"
-    url = build_url(base_url, location)
-    response = requests.get(url)
+def _fetch_forecast(location: str, key: str):
+    url = build_url("/forecast", location)
+    try:
+        response = get_client().get(url)
+    except httpx.HTTPError:
+        return None
 
     if response.status_code != 200:
-        return {"error": True, "message": "Failed to fetch forecast"}
+        return None
 
     data = response.json()
-    forecast = []
-    seen_dates = set()
-
-    for entry in data["list"]:
-        date = entry["dt_txt"].split(" ")[0]
-        if date not in seen_dates:
-            seen_dates.add(date)
-            forecast.append({
-                "date": date,
-                "temp": entry["main"]["temp"],
-                "description": entry["weather"][0]["description"]
-            })
-
-    return {"error": False, "forecast": forecast[:5]}
+    views = aggregate(data["list"])
+    forecast_cache.set(key, views, expires_at=next_slot_expiry(data["list"]))
+    return views
+
+
+# popular locations are refreshed in the background shortly before they expire
+warmer.register("weather", weather_cache, _fetch_current_weather)
+warmer.register("forecast", forecast_cache, _fetch_forecast)
+
+
+def get_current_weather_batch(locations: list):
+    """Current weather for many locations, fetched concurrently on the bounded batch pool."""
+    with upstream_priority(BULK):
+        return batch_response(locations, fan_out(get_current_weather, locations))
+
+
+def get_forecast_batch(locations: list):
+    """5-day forecasts for many locations, fetched concurrently on the bounded batch pool."""
+    with upstream_priority(BULK):
+        return batch_response(locations, fan_out(get_forecast, locations))
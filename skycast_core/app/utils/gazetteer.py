@@ -0,0 +1,99 @@
+"""Offline gazetteer: resolves city names to OpenWeatherMap city ids and serves autocomplete.
+
+Loaded once from OWM's `city.list.json` (optionally gzipped): a list of
+{"id", "name", "state", "country", "coord": {"lat", "lon"}} objects. Names are
+normalized (case-folded, accents stripped) into a sorted array, so a prefix query is
+one binary search plus a short scan, and an exact match is a dict lookup.
+"""
+import bisect
+import gzip
+import json
+import unicodedata
+
+from app import config
+
+
+def normalize(text: str):
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+class Gazetteer:
+    def __init__(self, cities=()):
+        self.cities = []    # (id, name, state, country, lat, lon)
+        self._by_name = {}  # normalized name -> [city index, ...]
+        for c in cities:
+            coord = c.get("coord") or {}
+            self.cities.append((int(c["id"]), c["name"], c.get("state") or "", (c.get("country") or "").upper(),
+                                coord.get("lat"), coord.get("lon")))
+            self._by_name.setdefault(normalize(c["name"]), []).append(len(self.cities) - 1)
+        self._names = sorted(self._by_name)
+
+    def __len__(self):
+        return len(self.cities)
+
+    @classmethod
+    def from_file(cls, path: str):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def resolve(self, location: str):
+        """
+        Resolve "City", "City,CC" or "City,State,CC" to a city tuple, or None when the
+        name is unknown or ambiguous across countries without a country hint.
+        """
+        parts = [p.strip() for p in location.split(",")]
+        candidates = self._by_name.get(normalize(parts[0]))
+        if not candidates:
+            return None
+        if len(parts) > 1:
+            country = parts[-1].upper()
+            state = normalize(parts[1]) if len(parts) == 3 else None
+            candidates = [i for i in candidates if self.cities[i][3] == country
+                          and (state is None or normalize(self.cities[i][2]) == state)]
+            if not candidates:
+                return None
+        elif len({self.cities[i][3] for i in candidates}) > 1:
+            return None
+        return self.cities[candidates[0]]
+
+    def suggest(self, prefix: str, limit: int = 10):
+        """Cities whose name starts with `prefix`, alphabetically, one entry per name/state/country."""
+        prefix = normalize(prefix)
+        out, seen = [], set()
+        if not prefix:
+            return out
+        i = bisect.bisect_left(self._names, prefix)
+        while i < len(self._names) and self._names[i].startswith(prefix) and len(out) < limit:
+            for idx in self._by_name[self._names[i]]:
+                city_id, name, state, country, lat, lon = self.cities[idx]
+                if (name, state, country) in seen:
+                    continue
+                seen.add((name, state, country))
+                out.append({"id": city_id, "name": name, "state": state, "country": country, "lat": lat, "lon": lon})
+                if len(out) >= limit:
+                    break
+            i += 1
+        return out
+
+
+gazetteer = Gazetteer()
+
+
+def load_gazetteer(path: str = None):
+    """Load the city list (called on app startup when GAZETTEER_PATH is set)."""
+    global gazetteer
+    path = path or config.GAZETTEER_PATH
+    if path:
+        gazetteer = Gazetteer.from_file(path)
+    return len(gazetteer)
+
+
+def resolve(location: str):
+    return gazetteer.resolve(location)
+
+
+def suggest(prefix: str, limit: int = 10):
+    return gazetteer.suggest(prefix, limit)
@@ -1,13 +1,134 @@
-import requests
-
-
-def get_location_from_ip():
-        """Get approximate user location using IP-based lookup."""
-        try:
-                res = requests.get("https://ipapi.co/json/")
-                if res.status_code == 200:
-                        data = res.json()
-                        return data.get("city", "unknown")
-        except Exception as e:
-                print(f"Error fetching location: {e}")
-                return "unknown"
+"""IP-based location fallback for requests that arrive without a location.
+
+Resolution order for a client IP:
+  1. per-IP LRU cache
+  2. offline IP-range table (sorted ranges, binary search), if one is configured
+  3. remote lookup on ipapi.co with a strict timeout
+Private / loopback addresses (e.g. local development) geolocate the server itself,
+which is what the original single ipapi.co call did.
+"""
+import bisect
+import csv
+import ipaddress
+import logging
+
+import httpx
+
+from app import config
+from app.utils.cache import TTLCache
+from app.utils.http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+_ip_cache = TTLCache(maxsize=config.GEOIP_CACHE_SIZE, ttl=config.GEOIP_CACHE_TTL)
+
+
+class IPRangeTable:
+    """Sorted, non-overlapping IP ranges mapped to a location string, one table per IP version."""
+
+    def __init__(self):
+        self._tables = {4: ([], [], []), 6: ([], [], [])}  # version -> (starts, ends, locations)
+
+    def __len__(self):
+        return sum(len(t[0]) for t in self._tables.values())
+
+    @classmethod
+    def from_csv(cls, path: str):
+        """
+        Load a MaxMind-style CSV. Ranges come from a `network` (CIDR) column or from
+        `start_ip` / `end_ip` columns; the location is the `city_name` / `city` column,
+        or `latitude` / `longitude` when no city is given.
+        """
+        rows = {4: [], 6: []}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("network"):
+                    net = ipaddress.ip_network(row["network"].strip(), strict=False)
+                    start, end = net.network_address, net.broadcast_address
+                else:
+                    start = ipaddress.ip_address(row["start_ip"].strip())
+                    end = ipaddress.ip_address(row["end_ip"].strip())
+                location = (row.get("city_name") or row.get("city") or "").strip()
+                if not location and row.get("latitude") and row.get("longitude"):
+                    location = f"{row['latitude'].strip()},{row['longitude'].strip()}"
+                if location:
+                    rows[start.version].append((int(start), int(end), location))
+
+        table = cls()
+        for version, entries in rows.items():
+            entries.sort()
+            starts, ends, locations = table._tables[version]
+            for start, end, location in entries:
+                starts.append(start)
+                ends.append(end)
+                locations.append(location)
+        return table
+
+    def lookup(self, ip: str):
+        """Return the location for `ip`, or None if it falls outside every range."""
+        addr = ipaddress.ip_address(ip)
+        starts, ends, locations = self._tables[addr.version]
+        value = int(addr)
+        i = bisect.bisect_right(starts, value) - 1
+        if i >= 0 and value <= ends[i]:
+            return locations[i]
+        return None
+
+
+_ip_ranges = IPRangeTable()
+
+
+def load_ip_ranges(path: str = None):
+    """Load the offline IP-range table (called on app startup when GEOIP_CSV_PATH is set)."""
+    global _ip_ranges
+    path = path or config.GEOIP_CSV_PATH
+    if path:
+        _ip_ranges = IPRangeTable.from_csv(path)
+        _ip_cache.clear()
+    return len(_ip_ranges)
+
+
+def client_ip(request):
+    """Best guess at the caller's IP: first X-Forwarded-For hop when trusted, else the peer address."""
+    if config.TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def _remote_lookup(ip: str = None):
+    url = f"https://ipapi.co/{ip}/json/" if ip else "https://ipapi.co/json/"
+    try:
+        res = get_client().get(url, timeout=config.GEOIP_REMOTE_TIMEOUT)
+        if res.status_code == 200:
+            return res.json().get("city")
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("Error fetching location: %s", e)
+    return None
+
+
+def get_location_from_ip(ip: str = None):
+    """Get approximate location for `ip` (or for the server when no public IP is known)."""
+    try:
+        addr = ipaddress.ip_address(ip) if ip else None
+    except ValueError:
+        addr = None
+    if addr is not None and not addr.is_global:
+        addr = None
+    key = str(addr) if addr else "self"
+
+    location = _ip_cache.get(key)
+    if location is not None:
+        return location
+
+    if addr is not None:
+        location = _ip_ranges.lookup(key)
+    if location is None:
+        location = _remote_lookup(key if addr else None)
+    if not location:
+        # failures are not cached so a transient outage does not stick
+        return "unknown"
+
+    _ip_cache.set(key, location)
+    return location
@@ -0,0 +1,175 @@
+"""Shared, pooled HTTP clients for OpenWeatherMap calls.
+
+The clients live for the lifetime of the FastAPI app: they are opened on
+startup and closed on shutdown, so every service call reuses keep-alive
+connections instead of paying a fresh TCP + TLS handshake per request.
+
+Requests to the OpenWeatherMap host pass through the upstream scheduler first (token
+bucket + priorities), and an OWM 429 pauses the scheduler and surfaces as
+UpstreamThrottled rather than as a failed lookup. The transports are wrapped in the
+upstream circuit breaker, so a failing OWM is not waited on call after call, and every
+call that does go out is timed for /metrics.
+"""
+import time
+
+import httpx
+
+from app import config
+from app.utils import metrics
+from app.utils.circuit_breaker import AsyncBreakerTransport, BreakerTransport, upstream_breaker
+from app.utils.scheduler import UpstreamThrottled, scheduler
+
+_client = None
+_async_client = None
+
+
+def _http2_enabled():
+    """HTTP/2 is used only when requested and the optional `h2` package is installed."""
+    if not config.UPSTREAM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _is_upstream(request: httpx.Request):
+    # the same clients also serve the IP geolocation fallback, which has its own limits
+    return request.url.host == httpx.URL(config.BASE_URL).host
+
+
+def _retry_after(response: httpx.Response):
+    try:
+        return max(float(response.headers.get("Retry-After", "")), 1.0)
+    except ValueError:
+        return 60.0
+
+
+def _admit(request: httpx.Request):
+    if _is_upstream(request):
+        scheduler.acquire()
+
+
+async def _admit_async(request: httpx.Request):
+    if _is_upstream(request):
+        await scheduler.acquire_async()
+
+
+def _check_quota(response: httpx.Response):
+    if response.status_code == 429 and _is_upstream(response.request):
+        retry_after = _retry_after(response)
+        scheduler.pause(retry_after)
+        raise UpstreamThrottled(retry_after)
+
+
+async def _check_quota_async(response: httpx.Response):
+    _check_quota(response)
+
+
+def _endpoint(request: httpx.Request):
+    # "weather" / "forecast" for OWM, the host for anything else
+    if _is_upstream(request):
+        return request.url.path.rstrip("/").rsplit("/", 1)[-1]
+    return request.url.host
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """Records latency, status code and in-flight count of every call for /metrics."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        status = "error"
+        started = time.perf_counter()
+        try:
+            with metrics.upstream_in_flight.track_inprogress():
+                response = self._transport.handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe_upstream(_endpoint(request), status, time.perf_counter() - started)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncMeteredTransport(httpx.AsyncBaseTransport):
+    """MeteredTransport for httpx.AsyncClient."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        status = "error"
+        started = time.perf_counter()
+        try:
+            with metrics.upstream_in_flight.track_inprogress():
+                response = await self._transport.handle_async_request(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe_upstream(_endpoint(request), status, time.perf_counter() - started)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _transport_kwargs():
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _client_kwargs():
+    return {
+        "base_url": config.BASE_URL,
+        "timeout": httpx.Timeout(config.UPSTREAM_TIMEOUT, connect=config.UPSTREAM_CONNECT_TIMEOUT),
+    }
+
+
+def get_client() -> httpx.Client:
+    """Return the shared sync client, creating it lazily if startup has not run."""
+    global _client
+    if _client is None or _client.is_closed:
+        transport = BreakerTransport(MeteredTransport(httpx.HTTPTransport(**_transport_kwargs())), upstream_breaker, _is_upstream)
+        _client = httpx.Client(
+            **_client_kwargs(), transport=transport,
+            event_hooks={"request": [_admit], "response": [_check_quota]},
+        )
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the shared async client, creating it lazily if startup has not run."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        transport = AsyncBreakerTransport(
+            AsyncMeteredTransport(httpx.AsyncHTTPTransport(**_transport_kwargs())), upstream_breaker, _is_upstream
+        )
+        _async_client = httpx.AsyncClient(
+            **_client_kwargs(), transport=transport,
+            event_hooks={"request": [_admit_async], "response": [_check_quota_async]},
+        )
+    return _async_client
+
+
+def startup():
+    get_client()
+    get_async_client()
+
+
+async def shutdown():
+    global _client, _async_client
+    if _client is not None:
+        _client.close()
+        _client = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
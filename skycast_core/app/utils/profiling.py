@@ -0,0 +1,316 @@
+"""On-demand profiling of single requests.
+
+With PROFILING_ENABLED=true, a request carrying `X-Profile: 1` (or `?profile=1`) plus a
+valid `X-Admin-Token` is profiled by a sampling profiler. Every PROFILING_INTERVAL_MS
+the profiler records the stacks of the threads serving that request, and only those,
+so concurrent unprofiled traffic stays out of the profile. The request's profiler is
+carried in a contextvar, and threads register while they work for it:
+
+- the event loop thread is sampled while it runs one of the request's tasks
+- sync endpoints on routers built with `route_class=ProfiledRoute` register their
+  threadpool thread
+- work handed to executors (upstream calls, batch fan-out, quota waits) is wrapped
+  with bind()
+
+The profile is written to PROFILING_DIR as a speedscope file (open it at
+https://www.speedscope.app) and its name is returned in the `X-Profile` response
+header. A request that finishes before the first sample gets `X-Profile: none` and no
+file. When profiling is disabled the middleware is not installed at all.
+"""
+import asyncio
+import contextvars
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".speedscope.json"
+# X-Profile value for a request that finished before the first sample
+NO_SAMPLES = "none"
+
+# the profiler of the request being served, if it is profiled
+_active = contextvars.ContextVar("active_profiler", default=None)
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads registered as serving one request until stopped."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._frames = []
+        self._frame_index = {}
+        self._samples = defaultdict(list)  # thread id -> [(stack, weight in ms)]
+        self._names = {}
+        self._threads = Counter()  # thread id -> nested attach() count
+        self._tasks = set()  # the request's asyncio tasks
+        self._loop = self._loop_thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = self.stopped = 0.0
+
+    @property
+    def captured(self):
+        return bool(self._samples)
+
+    def attach(self):
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def detach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] -= 1
+            if not self._threads[ident]:
+                del self._threads[ident]
+
+    def adopt(self, task):
+        """Sample the event loop thread whenever it is running `task`; call on the loop."""
+        self._loop, self._loop_thread = task.get_loop(), threading.get_ident()
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _serving(self):
+        with self._lock:
+            idents = set(self._threads)
+        if self._loop is not None and asyncio.current_task(self._loop) in self._tasks:
+            idents.add(self._loop_thread)
+        return idents
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample((now - last) * 1000)
+            last = now
+
+    def _frame(self, code):
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self._frames)
+            name = getattr(code, "co_qualname", code.co_name)
+            self._frames.append({"name": name, "file": code.co_filename, "line": code.co_firstlineno})
+        return index
+
+    def _sample(self, weight: float):
+        idents = self._serving()
+        if not idents:
+            return
+        for ident, frame in sys._current_frames().items():
+            if ident not in idents:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self._samples[ident].append((stack, weight))
+        self._names.update((t.ident, t.name) for t in threading.enumerate())
+
+    def to_speedscope(self, name: str):
+        """The samples as a speedscope file: one sampled profile per thread that served the request."""
+        profiles = []
+        for ident, samples in self._samples.items():
+            total = sum(weight for _, weight in samples)
+            profiles.append({
+                "type": "sampled",
+                "name": self._names.get(ident, str(ident)),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(total, 3),
+                "samples": [stack for stack, _ in samples],
+                "weights": [round(weight, 3) for _, weight in samples],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "skycast",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self._frames},
+            "profiles": profiles,
+        }
+
+
+@contextmanager
+def attached():
+    """Register the current thread with the active request's profiler while the block runs."""
+    profiler = _active.get()
+    if profiler is None:
+        yield
+        return
+    profiler.attach()
+    try:
+        yield
+    finally:
+        profiler.detach()
+
+
+def bind(fn):
+    """Wrap `fn` so the thread it runs on counts as serving the request that is active
+    when it runs. Submit it with a copy of the caller's context."""
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        with attached():
+            return fn(*args, **kwargs)
+    return bound
+
+
+def adopt(task):
+    """Count an asyncio task spawned by a profiled request as part of it."""
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.adopt(task)
+
+
+class ProfiledRoute(APIRoute):
+    """Route whose sync endpoint registers its threadpool thread with the request's profiler.
+
+    The endpoint is wrapped only when profiling is enabled; FastAPI reads its signature
+    through the wrapper's `__wrapped__`.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if enabled(warn=False) and inspect.isfunction(endpoint) and not inspect.iscoroutinefunction(endpoint):
+            endpoint = bind(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _header(scope, name: bytes):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _requested(scope):
+    if _header(scope, b"x-profile") in ("1", "true"):
+        return True
+    return parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [""])[-1] in ("1", "true")
+
+
+def is_admin(token: str):
+    return bool(config.PROFILING_ADMIN_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode(), config.PROFILING_ADMIN_TOKEN.encode())
+
+
+def _prune(keep: int):
+    names = sorted(n for n in os.listdir(config.PROFILING_DIR) if n.endswith(SUFFIX))
+    for old in names[:-keep] if keep > 0 else []:
+        try:
+            os.remove(os.path.join(config.PROFILING_DIR, old))
+        except OSError:
+            pass
+
+
+def _write(profiler: SamplingProfiler, filename: str, title: str):
+    os.makedirs(config.PROFILING_DIR, exist_ok=True)
+    with open(os.path.join(config.PROFILING_DIR, filename), "w") as f:
+        json.dump(profiler.to_speedscope(title), f)
+    _prune(config.PROFILING_KEEP)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that ask for it (admins only, one at a time)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not is_admin(_header(scope, b"x-admin-token")):
+            response = JSONResponse(status_code=403, content={"error": True, "message": "Profiling requires a valid admin token."})
+            await response(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            # one sampler at a time keeps the profiling overhead bounded
+            await self.app(scope, receive, self._with_header(send, "busy"))
+            return
+
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}{SUFFIX}"
+        title = f"{scope['method']} {scope['path']}"
+        profiler = SamplingProfiler(config.PROFILING_INTERVAL_MS / 1000)
+        announced = [filename]
+        token = _active.set(profiler)
+        profiler.adopt(asyncio.current_task())
+        profiler.start()
+        try:
+            await self.app(scope, receive, self._with_profile_header(send, profiler, announced))
+        finally:
+            _active.reset(token)
+            profiler.stop()
+            elapsed = (profiler.stopped - profiler.started) * 1000
+            try:
+                if announced[0] == NO_SAMPLES or not profiler.captured:
+                    logger.info("%s finished in %.1f ms, before the first sample; no profile written", title, elapsed)
+                else:
+                    await asyncio.to_thread(_write, profiler, filename, title)
+                    logger.info("Profiled %s in %.1f ms: %s", title, elapsed, filename)
+            except OSError:
+                logger.exception("Could not write profile %s", filename)
+            finally:
+                self._busy.release()
+
+    @staticmethod
+    def _with_header(send, value: str):
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile", value.encode())]
+            await send(message)
+        return send_with_header
+
+    @staticmethod
+    def _with_profile_header(send, profiler: SamplingProfiler, announced: list):
+        """Hold the response start until the first body message. If that one completes
+        the response and nothing has been sampled, announce NO_SAMPLES instead of a file."""
+        held = []
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                held.append(message)
+                return
+            if held:
+                start = held.pop()
+                if message["type"] == "http.response.body" and not message.get("more_body", False) \
+                        and not profiler.captured:
+                    announced[0] = NO_SAMPLES
+                start["headers"] = list(start.get("headers", [])) + [(b"x-profile", announced[0].encode())]
+                await send(start)
+            await send(message)
+        return send_with_header
+
+
+def enabled(warn: bool = True):
+    """Profiling is on only when configured and an admin token exists to restrict it."""
+    if warn and config.PROFILING_ENABLED and not config.PROFILING_ADMIN_TOKEN:
+        logger.warning("PROFILING_ENABLED is set but PROFILING_ADMIN_TOKEN is not; profiling stays off")
+    return config.PROFILING_ENABLED and bool(config.PROFILING_ADMIN_TOKEN)
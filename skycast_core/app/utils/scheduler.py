@@ -0,0 +1,163 @@
+"""Quota-aware admission for OpenWeatherMap calls.
+
+Every upstream request takes a token from a bucket refilled at the configured
+calls-per-minute quota. Callers that find it empty queue by priority, so interactive
+lookups are served before bulk work (batch endpoints, date ranges), and bulk work
+additionally leaves a few tokens in reserve for them. A caller that cannot get a token
+within its wait budget gets UpstreamThrottled, which the app answers with 429 and
+Retry-After instead of letting OWM reject the call.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from app import config
+from app.utils.profiling import bind
+
+INTERACTIVE = 0
+BULK = 1
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def upstream_priority(priority: int):
+    """Run the enclosed upstream calls (including ones fanned out to worker threads) at `priority`."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class UpstreamThrottled(Exception):
+    def __init__(self, retry_after: float, message: str = "Upstream rate limit reached, retry later."):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def wait_time(self, tokens: float, now: float):
+        """Seconds until `tokens` tokens are available (0 if they already are)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def try_take(self, tokens: float = 1, now: float = None):
+        """Take `tokens` tokens if they are available right now; returns whether it did."""
+        if self.wait_time(tokens, time.monotonic() if now is None else now) > 0:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class UpstreamScheduler:
+    def __init__(self, rate_per_minute: float, burst: int, reserve: int, max_wait: float, bulk_max_wait: float):
+        self.enabled = rate_per_minute > 0
+        self.bucket = TokenBucket(rate_per_minute, burst) if self.enabled else None
+        self.reserve = reserve
+        self.max_wait = {INTERACTIVE: max_wait, BULK: bulk_max_wait}
+        self._cond = threading.Condition()
+        # waiting callers as (priority, arrival); the heap head is served first
+        self._waiting = []
+        self._arrivals = itertools.count()
+        # set from an upstream 429 so nobody calls OWM again before its Retry-After
+        self._paused_until = 0.0
+        self.granted = 0
+        self.throttled = 0
+
+    def _tokens_needed(self, priority: int):
+        return min(1 + (self.reserve if priority == BULK else 0), self.bucket.capacity)
+
+    def _wait_time(self, priority: int, now: float):
+        return max(self.bucket.wait_time(self._tokens_needed(priority), now), self._paused_until - now)
+
+    def acquire(self, priority: int = None):
+        """Block until this call may go upstream, or raise UpstreamThrottled once the wait budget is spent."""
+        if not self.enabled:
+            return
+        priority = current_priority() if priority is None else priority
+        entry = (priority, next(self._arrivals))
+        deadline = time.monotonic() + self.max_wait[priority]
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiting[0] == entry:
+                        wait = self._wait_time(priority, now)
+                        if wait <= 0:
+                            self.bucket.tokens -= 1
+                            self.granted += 1
+                            return
+                        # no token will free up in time: fail now rather than at the deadline
+                        timed_out = now + wait > deadline
+                    else:
+                        # someone ahead is served first; woken whenever the queue head changes
+                        wait = deadline - now
+                        timed_out = wait <= 0
+                    if timed_out:
+                        self.throttled += 1
+                        raise UpstreamThrottled(self._retry_after(entry, now))
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    async def acquire_async(self, priority: int = None):
+        """acquire() for the event loop: waits on a worker thread (the priority context is copied along)."""
+        if self.enabled:
+            await asyncio.to_thread(bind(self.acquire), priority)
+
+    def _retry_after(self, entry, now: float):
+        # tokens still owed to everyone queued ahead of this caller, plus its own
+        ahead = sum(1 for other in self._waiting if other < entry)
+        return max(self._wait_time(entry[0], now) + ahead / self.bucket.rate, 1.0)
+
+    def pause(self, seconds: float):
+        """OWM itself answered 429: stop admitting calls for `seconds` and empty the bucket."""
+        if not self.enabled:
+            return
+        with self._cond:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self.bucket.wait_time(0, now)
+            self.bucket.tokens = 0.0
+            self._cond.notify_all()
+
+    def stats(self):
+        if not self.enabled:
+            return {"enabled": False}
+        with self._cond:
+            self.bucket.wait_time(0, time.monotonic())
+            return {
+                "enabled": True,
+                "tokens": round(self.bucket.tokens, 2),
+                "waiting": len(self._waiting),
+                "granted": self.granted,
+                "throttled": self.throttled,
+            }
+
+
+scheduler = UpstreamScheduler(
+    rate_per_minute=config.UPSTREAM_RATE_PER_MINUTE,
+    burst=config.UPSTREAM_BURST,
+    reserve=config.UPSTREAM_INTERACTIVE_RESERVE,
+    max_wait=config.UPSTREAM_MAX_WAIT,
+    bulk_max_wait=config.UPSTREAM_BULK_MAX_WAIT,
+)
@@ -0,0 +1,88 @@
+"""Request coalescing ("single-flight") for identical in-flight upstream calls.
+
+When several requests ask for the same key at the same time, only the first one
+runs the call; the others wait for it and share its result (or its exception).
+"""
+import asyncio
+import threading
+
+from app.utils.profiling import adopt
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-based coalescing for sync code running in FastAPI's threadpool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        call, leader = self.join(key)
+        if not leader:
+            call.event.wait()
+            return self.outcome(call)
+        return self.lead(key, call, fn, *args, **kwargs)
+
+    def join(self, key):
+        """Return (call, leader) for `key`; the leader must run it with lead()."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        return call, leader
+
+    def lead(self, key, call, fn, *args, **kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    @staticmethod
+    def outcome(call):
+        """Result of a finished call, re-raising its exception."""
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class AsyncSingleFlight:
+    """asyncio coalescing: followers await the leader's task."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            # the shared fetch runs in its own task; it is this caller's work while profiling
+            adopt(task)
+            self._tasks[key] = task
+            task.add_done_callback(lambda _t: self._tasks.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield so one cancelled waiter does not cancel the fetch shared with the others
+        return await asyncio.shield(task)
+
+
+# one instance per kind of caller; keys are prefixed with the upstream endpoint
+upstream_flight = SingleFlight()
+async_upstream_flight = AsyncSingleFlight()
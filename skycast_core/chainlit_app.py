@@ -112,7 +112,7 @@ async def show_forecast(action: cl.Action):
 
     lines = ["📅 **5-Day Forecast**:"]
     for day in data["forecast"]:
-        lines.append(f"{day['date']}: {day['temp']} °C — {day['description'].capitalize()}")
+        lines.append(f"{day['date']}: {day['temp_min']}–{day['temp_max']} °C (avg {day['temp']}) — {day['description'].capitalize()}")
     await cl.Message(content="\n".join(lines)).send()
 
 
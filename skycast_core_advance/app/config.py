@@ -3,4 +3,102 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
 DB_URL = os.getenv("DB_URL", "sqlite:///./weather_history.db")
+
+# database engine / connection pool (SQLite pragmas only apply to sqlite URLs)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "15"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# upstream HTTP client pool (shared by every OpenWeatherMap call)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+
+# upstream quota: token bucket shared by every OpenWeatherMap call (rate 0 disables it)
+UPSTREAM_RATE_PER_MINUTE = float(os.getenv("UPSTREAM_RATE_PER_MINUTE", "60"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "10"))
+# tokens bulk work (batch endpoints, date ranges) must leave for interactive lookups
+UPSTREAM_INTERACTIVE_RESERVE = int(os.getenv("UPSTREAM_INTERACTIVE_RESERVE", "2"))
+# seconds a call may queue for a token before the API answers 429
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "2"))
+UPSTREAM_BULK_MAX_WAIT = float(os.getenv("UPSTREAM_BULK_MAX_WAIT", "30"))
+
+# circuit breaker: consecutive upstream failures before calls fail fast, seconds until a trial call
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+# stale-while-revalidate: expired payloads are still served (flagged stale) for this long
+# while one background refresh runs; cache misses wait at most UPSTREAM_DEADLINE seconds
+CACHE_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", "3600"))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "4"))
+# threads running upstream calls for cache misses (single-flight leaders only) and,
+# separately, for background refreshes of stale entries
+UPSTREAM_FETCH_WORKERS = int(os.getenv("UPSTREAM_FETCH_WORKERS", "16"))
+UPSTREAM_REFRESH_WORKERS = int(os.getenv("UPSTREAM_REFRESH_WORKERS", "4"))
+
+# cache warmer: refresh the WARMER_TOP_N most requested locations WARMER_LEAD seconds before they expire,
+# checking every WARMER_INTERVAL seconds and spending at most WARMER_QUOTA_SHARE of the upstream quota
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "true").lower() == "true"
+WARMER_TOP_N = int(os.getenv("WARMER_TOP_N", "50"))
+WARMER_INTERVAL = float(os.getenv("WARMER_INTERVAL", "15"))
+WARMER_LEAD = float(os.getenv("WARMER_LEAD", "60"))
+WARMER_QUOTA_SHARE = float(os.getenv("WARMER_QUOTA_SHARE", "0.2"))
+WARMER_WORKERS = int(os.getenv("WARMER_WORKERS", "2"))
+# popularity counts are halved this often so the hot set follows current traffic
+WARMER_DECAY_INTERVAL = float(os.getenv("WARMER_DECAY_INTERVAL", "600"))
+
+# per-request profiling (opt-in): requests with `X-Profile: 1` or `?profile=1` and a matching
+# `X-Admin-Token` are sampled every PROFILING_INTERVAL_MS and saved to PROFILING_DIR as speedscope files
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_KEEP = int(os.getenv("PROFILING_KEEP", "50"))
+
+# current-weather response cache
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "1024"))
+
+# forecast cache: entries expire at the next 3-hour forecast slot, only the size is tunable
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "1024"))
+
+# batch endpoints: max locations per request and concurrent upstream calls
+BATCH_MAX_LOCATIONS = int(os.getenv("BATCH_MAX_LOCATIONS", "200"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+# history recording for /weather: "buffered" (write-behind queue) or "sync" (commit per request)
+HISTORY_WRITE_MODE = os.getenv("HISTORY_WRITE_MODE", "buffered").lower()
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "10000"))
+HISTORY_FLUSH_SIZE = int(os.getenv("HISTORY_FLUSH_SIZE", "500"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1.0"))
+# a failed flush is retried after HISTORY_RETRY_BACKOFF seconds, doubling up to the max
+HISTORY_RETRY_BACKOFF = float(os.getenv("HISTORY_RETRY_BACKOFF", "0.5"))
+HISTORY_RETRY_BACKOFF_MAX = float(os.getenv("HISTORY_RETRY_BACKOFF_MAX", "30"))
+HISTORY_SHUTDOWN_ATTEMPTS = int(os.getenv("HISTORY_SHUTDOWN_ATTEMPTS", "5"))
+
+# in-memory columnar mirror of weather_records answering /history/query
+HISTORY_COLUMNAR = os.getenv("HISTORY_COLUMNAR", "true").lower() == "true"
+
+# keyset pagination for /history and /records
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+# rows fetched per database round trip by streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# background export jobs and their cached artifacts
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_JOB_HISTORY = int(os.getenv("EXPORT_JOB_HISTORY", "100"))
+# artifacts kept per format; older versions may still be downloading when a new one lands
+EXPORT_ARTIFACT_KEEP = int(os.getenv("EXPORT_ARTIFACT_KEEP", "3"))
+# rows per Arrow record batch / Parquet row group chunk
+EXPORT_ARROW_BATCH_SIZE = int(os.getenv("EXPORT_ARROW_BATCH_SIZE", "50000"))
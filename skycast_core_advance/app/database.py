@@ -1,7 +1,108 @@
-from sqlalchemy import create_engine
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app import config
+from app.utils.metrics import Histogram
 
 
 Base = declarative_base()
-engine = create_engine("sqlite:///weather_history.db")
-SessionLocal = sessionmaker(bind=engine)
+
+
+def _create_engine(url: str):
+    """Engine for `url`; SQLite gets a thread-safe pooled setup plus tuned pragmas."""
+    db_url = make_url(url)
+    kwargs = {"pool_pre_ping": True}
+    if db_url.get_backend_name() == "sqlite":
+        # FastAPI runs sync routes in a threadpool, so connections move between threads
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": config.DB_BUSY_TIMEOUT}
+        if db_url.database in (None, "", ":memory:"):
+            return create_engine(url, **kwargs)
+    kwargs.update(pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW, pool_recycle=config.DB_POOL_RECYCLE)
+    return create_engine(url, **kwargs)
+
+
+engine = _create_engine(config.DB_URL)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _record):
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_conn.cursor()
+    # WAL lets readers run alongside the single writer instead of blocking on the rollback journal
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+# query and commit timings for /metrics
+db_query_duration = Histogram("skycast_db_query_duration_seconds", "SQL statement execution time by statement type.",
+                              ("statement",))
+db_commit_duration = Histogram("skycast_db_commit_duration_seconds", "Session commit time, including the final flush.")
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _observe_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is not None:
+        # SELECT / INSERT / UPDATE / DELETE ...: keeps label values bounded
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_duration.observe(time.perf_counter() - started, statement=kind)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _start_commit_timer(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _observe_commit(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        db_commit_duration.observe(time.perf_counter() - started)
+
+
+def get_db():
+    """FastAPI dependency: one session per request, always closed afterwards."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def snapshot_session():
+    """Session whose reads all see one consistent snapshot of the database until it closes."""
+    db = SessionLocal()
+    try:
+        if engine.dialect.name == "sqlite":
+            # pysqlite only opens transactions before writes; an explicit BEGIN pins one WAL
+            # read snapshot for every SELECT that follows
+            db.connection().exec_driver_sql("BEGIN")
+        else:
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        yield db
+    finally:
+        db.close()
+
+
+def init_db():
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add indexes introduced since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
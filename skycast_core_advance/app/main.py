@@ -1,21 +1,62 @@
-from fastapi import FastAPI
-from app.database import Base, engine
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.database import init_db
 
 # import models so tables are registered with SQLAlchemy
-from app.models import history_model  # noqa: F401
-from app.routes import weather_routes, forecast_routes, export_routes, history_routes
+from app.models import history_model, rollup_model  # noqa: F401
+from app.routes import weather_routes, forecast_routes, export_routes, history_routes, stats_routes, metrics_routes, profile_routes
+from app.services.columnar_history import columnar
+from app.services.history_recorder import recorder
+from app.services.rollup_service import ensure_rollups
+from app.utils import http_client, profiling
+from app.utils.cache_warmer import warmer
+from app.utils.metrics import MetricsMiddleware
+from app.utils.scheduler import UpstreamThrottled
 
 # database tables creation
-Base.metadata.create_all(bind=engine)
+init_db()
+# backfill rollups for rows written before they existed
+ensure_rollups()
+
+# shared upstream client, columnar history mirror, cache warmer and history writer live as long as the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_client.startup()
+    columnar.load()
+    recorder.start()
+    warmer.start()
+    yield
+    warmer.stop()
+    # flush buffered history before the process exits
+    recorder.stop()
+    http_client.shutdown()
+
 
 # main app init
-app = FastAPI(title="SkyCast CRUD Weather API")
+app = FastAPI(title="SkyCast CRUD Weather API", lifespan=lifespan)
+# per-route request counts and latency for /metrics
+app.add_middleware(MetricsMiddleware)
 
 # routes register karna
 app.include_router(weather_routes.router)
 app.include_router(forecast_routes.router)
 app.include_router(export_routes.router)
 app.include_router(history_routes.router)
+app.include_router(stats_routes.router)
+app.include_router(metrics_routes.router)
+
+# opt-in per-request profiling: neither the middleware nor /profiles exist unless enabled
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+    app.include_router(profile_routes.router)
+
+# upstream quota exhausted: tell the client when to retry instead of failing the lookup
+@app.exception_handler(UpstreamThrottled)
+async def upstream_throttled(request: Request, exc: UpstreamThrottled):
+    return JSONResponse(status_code=429, content={"error": True, "message": str(exc)},
+                        headers={"Retry-After": str(math.ceil(exc.retry_after))})
 
 # root endpoint
 @app.get("/")
@@ -1,12 +1,32 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from datetime import datetime
 from app.database import Base
 
 class WeatherRecord(Base):
     __tablename__ = "weather_records"
+    __table_args__ = (
+        # city / created_at filters for paginated history become index range scans
+        Index("ix_weather_records_city_created_at", "city", "created_at"),
+        Index("ix_weather_records_created_at", "created_at"),
+        # per-city keyset pages (city = ? AND id > ? ORDER BY id) walk this without a sort
+        Index("ix_weather_records_city_id", "city", "id"),
+        # ORDER BY temp and top-k extremes (overall / per city) read straight off an index
+        Index("ix_weather_records_temp", "temp"),
+        Index("ix_weather_records_city_temp", "city", "temp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     city = Column(String)
     temp = Column(Float)
     desc = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class HistoryGeneration(Base):
+    """Single-row counter bumped in the same transaction as every update or delete of
+    weather_records. It is part of the export artifact version, so it must outlive the
+    process and be shared by every worker."""
+    __tablename__ = "history_generation"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from app.database import Base
+
+class _RollupColumns:
+    # one row per (city, bucket start); avg is temp_sum / count
+    city = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    temp_sum = Column(Float, nullable=False)
+    temp_min = Column(Float, nullable=False)
+    temp_max = Column(Float, nullable=False)
+
+class HourlyRollup(_RollupColumns, Base):
+    __tablename__ = "weather_rollup_hourly"
+
+class DailyRollup(_RollupColumns, Base):
+    __tablename__ = "weather_rollup_daily"
@@ -1,38 +1,90 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from app.database import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from app.database import get_db
 from app.models.history_model import WeatherRecord
-from app.utils.export_utils import export_data
+from app.services import export_jobs
+from app.services.export_service import iter_record_rows
+from app.utils.export_utils import ARROW_FORMATS, STREAM_ENCODERS, arrow_available
+from app.utils.profiling import ProfiledRoute
 import os
 import mimetypes
+import time
 
-router = APIRouter(prefix="/export")
+router = APIRouter(prefix="/export", route_class=ProfiledRoute)
 
 
-@router.get("/{format_type}")
-def export_records(format_type: str):
-    db = SessionLocal()
-    records = db.query(WeatherRecord).all()
-    db.close()
+def _file_response(path: str, format_type: str):
+    # Determine mime type
+    mime_type = ARROW_FORMATS.get(format_type)
+    if not mime_type:
+        mime_type, _ = mimetypes.guess_type(path)
+    if not mime_type:
+        mime_type = "application/octet-stream"
+    return FileResponse(path=path, media_type=mime_type, filename=f"weather_records.{format_type}")
 
-    if not records:
-        raise HTTPException(status_code=404, detail="No records found to export.")
 
-    data = [{"id": r.id, "city": r.city, "temp": r.temp, "desc": r.desc} for r in records]
-    os.makedirs("exports", exist_ok=True)
-    # export_utils will add the extension, so pass a base filename without extension
-    filename_base = "exports/weather_records"
+def _timed_stream(chunks, format_type: str):
+    # a streamed export is done once its last chunk has been handed to the server
+    started = time.perf_counter()
+    yield from chunks
+    export_jobs.export_duration.observe(time.perf_counter() - started, format=format_type)
 
-    export_data(data, format_type=format_type, filename=filename_base)
 
-    filename = f"{filename_base}.{format_type}"
+def _require_arrow(format_type: str):
+    if format_type in ARROW_FORMATS and not arrow_available():
+        raise HTTPException(status_code=501, detail=f"{format_type} export requires the pyarrow package.")
 
-    if not os.path.exists(filename):
-        raise HTTPException(status_code=500, detail="Export failed, file not found.")
 
-    # Determine mime type
-    mime_type, _ = mimetypes.guess_type(filename)
-    if not mime_type:
-        mime_type = "application/octet-stream"
+@router.post("/jobs")
+def create_export_job(format_type: str = "pdf"):
+    """Queue an export in the background; poll GET /export/jobs/{id} and then download it."""
+    if format_type not in export_jobs.JOB_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format_type}")
+    _require_arrow(format_type)
+    job = export_jobs.submit(format_type)
+    return export_jobs.public_view(job)
+
+
+@router.get("/jobs/{job_id}")
+def read_export_job(job_id: str):
+    job = export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found.")
+    return export_jobs.public_view(job)
+
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(job_id: str):
+    job = export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found.")
+    if job["status"] != "done" or not os.path.exists(job["path"]):
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}.")
+    return _file_response(job["path"], job["format"])
+
+
+@router.get("/{format_type}")
+def export_records(format_type: str, db: Session = Depends(get_db)):
+    if db.query(WeatherRecord.id).first() is None:
+        raise HTTPException(status_code=404, detail="No records found to export.")
+
+    # csv / json / ndjson are encoded while rows stream out of the database: no temp file
+    if format_type in STREAM_ENCODERS:
+        encoder, media_type = STREAM_ENCODERS[format_type]
+        return StreamingResponse(
+            _timed_stream(encoder(iter_record_rows()), format_type),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="weather_records.{format_type}"'},
+        )
+    if format_type != "pdf" and format_type not in ARROW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format_type}")
+    _require_arrow(format_type)
 
-    return FileResponse(path=filename, media_type=mime_type, filename=os.path.basename(filename))
+    # file formats (PDF, Parquet, Arrow) are built inline only when no artifact exists for
+    # the current history version; large PDFs should go through POST /export/jobs instead
+    try:
+        path, _ = export_jobs.build_artifact(format_type)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Export failed.")
+    return _file_response(path, format_type)
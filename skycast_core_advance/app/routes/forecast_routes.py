@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Query
 from app.services.forecast_service import get_forecast
+from app.utils.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/forecast")
-def forecast(location: str = Query(..., description="City name or ZIP code")):
-    return get_forecast(location)
+def forecast(location: str = Query(..., description="City name or ZIP code"),
+             detail: str = Query("daily", description="daily (per-day min/max/mean) or hourly (3-hour slots)")):
+    return get_forecast(location, detail)
@@ -1,17 +1,76 @@
-from fastapi import APIRouter
-from app.services.history_service import get_all_history, delete_history
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app import config
+from app.database import get_db
+from app.services.history_service import get_history_page, get_history_page_by_temp, get_extremes, delete_history
+from app.services.columnar_history import run_query
+from app.services.rollup_service import get_rollup_stats
+from app.utils.profiling import ProfiledRoute
 
-router = APIRouter(prefix="/history")
+router = APIRouter(prefix="/history", route_class=ProfiledRoute)
+
+def _as_dicts(records):
+    return [{"id": d.id, "city": d.city, "temp": d.temp, "desc": d.desc} for d in records]
 
 @router.get("/")
-def read_history(sort: bool = False):
-    data = get_all_history(sort=sort)
-    return {"count": len(data), "records": [
-        {"id": d.id, "city": d.city, "temp": d.temp, "desc": d.desc} for d in data
-    ]}
+def read_history(sort: bool = Query(False, description="Order by temperature (ascending) instead of id"),
+                 limit: int = Query(config.PAGE_SIZE_DEFAULT, ge=1, le=config.PAGE_SIZE_MAX),
+                 after_id: int = Query(None, description="Return records after this id (from next_after_id)"),
+                 after_temp: float = Query(None, description="With sort=true: temp of the after_id record (from next_after_temp)"),
+                 city: str = None, since: datetime = None, until: datetime = None,
+                 db: Session = Depends(get_db)):
+    if sort:
+        try:
+            data, cursor = get_history_page_by_temp(db, limit, after_id, after_temp, city, since, until)
+        except ValueError as e:
+            return {"error": True, "message": str(e)}
+        next_after_temp, next_after_id = cursor if cursor else (None, None)
+        return {"count": len(data), "next_after_id": next_after_id, "next_after_temp": next_after_temp,
+                "records": _as_dicts(data)}
+
+    data, next_after_id = get_history_page(db, limit, after_id, city, since, until)
+    return {"count": len(data), "next_after_id": next_after_id, "records": _as_dicts(data)}
+
+
+@router.get("/extremes")
+def read_extremes(k: int = Query(10, ge=1, le=config.PAGE_SIZE_MAX), city: str = None,
+                  db: Session = Depends(get_db)):
+    """Hottest and coldest k readings, overall or for one city."""
+    extremes = get_extremes(db, k, city)
+    return {name: _as_dicts(records) for name, records in extremes.items()}
+
+
+@router.get("/stats")
+def read_stats(city: str = None, granularity: str = Query("day", description="hour or day"),
+               start: datetime = Query(None, alias="from"), end: datetime = Query(None, alias="to"),
+               db: Session = Depends(get_db)):
+    """Per-city min/max/avg temperature per hour or day, served from the rollup tables."""
+    try:
+        buckets = get_rollup_stats(db, granularity, city, start, end)
+    except ValueError as e:
+        return {"error": True, "message": str(e)}
+    return {"granularity": granularity, "count": len(buckets), "buckets": buckets}
+
+
+@router.get("/query")
+def query_history(op: str = Query("summary", description="summary (per-city stats and percentiles), histogram or trend"),
+                  city: str = None, since: datetime = None, until: datetime = None,
+                  percentiles: str = Query("50,90,99", description="Comma-separated percentiles for op=summary"),
+                  bins: int = Query(20, ge=1, le=1000, description="Bucket count for op=histogram"),
+                  interval: str = Query("day", description="hour or day for op=trend")):
+    """Vectorized analytics over the in-memory columnar mirror of the history table."""
+    try:
+        qs = [float(q) for q in percentiles.split(",") if q.strip()]
+    except ValueError:
+        return {"error": True, "message": "percentiles must be comma-separated numbers, e.g. 50,90,99"}
+    try:
+        return run_query(op, city, since, until, qs, bins, interval)
+    except ValueError as e:
+        return {"error": True, "message": str(e)}
 
 
 @router.delete("/{record_id}")
-def remove_history(record_id: int):
-    success = delete_history(record_id)
+def remove_history(record_id: int, db: Session = Depends(get_db)):
+    success = delete_history(db, record_id)
     return {"deleted": success}
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response
+from app.services.forecast_service import forecast_cache
+from app.services.weather_service import weather_cache
+from app.utils.metrics import CONTENT_TYPE, REGISTRY, cache_families
+
+router = APIRouter()
+
+_caches = {"weather": weather_cache, "forecast": forecast_cache}
+REGISTRY.add_collector(lambda: cache_families(_caches))
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from app.services.forecast_service import forecast_cache
+from app.services.history_recorder import recorder
+from app.services.weather_service import weather_cache
+from app.utils import resilience
+from app.utils.cache_warmer import warmer
+from app.utils.circuit_breaker import upstream_breaker
+from app.utils.scheduler import scheduler
+from app.utils.singleflight import upstream_flight
+
+router = APIRouter()
+
+@router.get("/stats")
+def read_stats():
+    """Cache and coalescing counters, useful to see how much upstream traffic is being saved."""
+    return {
+        "weather_cache": weather_cache.stats(),
+        "forecast_cache": forecast_cache.stats(),
+        "coalesced_requests": upstream_flight.coalesced,
+        "upstream_scheduler": scheduler.stats(),
+        "upstream_breaker": upstream_breaker.stats(),
+        "deadline_misses": resilience.deadline_misses.value(),
+        "cache_warmer": warmer.stats(),
+        "history_recorder": {"running": recorder.running, "pending": recorder.pending(), "flushed": recorder.flushed,
+                             "failed_flushes": recorder.failed_flushes, "dropped": recorder.dropped},
+    }
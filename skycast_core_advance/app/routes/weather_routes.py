@@ -1,42 +1,69 @@
-from fastapi import APIRouter, Query
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app import config
+from app.database import get_db
 from app.services import weather_service, forecast_service
+from app.utils.batch import LocationBatch
+from app.utils.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/weather")
-def read_weather(location: str = Query(...)):
-    return weather_service.get_current_weather(location)
+def read_weather(location: str = Query(...), db: Session = Depends(get_db)):
+    return weather_service.get_current_weather(db, location)
+
+@router.post("/weather/batch")
+def read_weather_batch(batch: LocationBatch, db: Session = Depends(get_db)):
+    """Current weather for many locations in one call; each result carries its own error flag."""
+    return weather_service.get_current_weather_batch(db, batch.locations)
 
 @router.get("/records")
-def get_records():
-    return weather_service.get_all_records()
+def get_records(limit: int = Query(config.PAGE_SIZE_DEFAULT, ge=1, le=config.PAGE_SIZE_MAX),
+                after_id: int = Query(None, description="Return records after this id (from next_after_id)"),
+                city: str = None, since: datetime = None, until: datetime = None,
+                db: Session = Depends(get_db)):
+    return weather_service.get_all_records(db, limit, after_id, city, since, until)
+
+@router.delete("/records")
+def delete_records_range(from_id: int = None, to_id: int = None, city: str = None, before: datetime = None,
+                         db: Session = Depends(get_db)):
+    """Bulk delete by id range (from_id..to_id, inclusive), city and/or created_at before a timestamp."""
+    return weather_service.delete_records_where(db, from_id, to_id, city, before)
 
 @router.put("/update/{record_id}")
-def update_weather(record_id: int, desc: str):
-    return weather_service.update_record(record_id, desc)
+def update_weather(record_id: int, desc: str, db: Session = Depends(get_db)):
+    return weather_service.update_record(db, record_id, desc)
 
 @router.delete("/delete/{record_id}")
-def delete_weather(record_id: int):
-    return weather_service.delete_record(record_id)
+def delete_weather(record_id: int, db: Session = Depends(get_db)):
+    return weather_service.delete_record(db, record_id)
 
 @router.get("/forecast")
-def read_forecast(location: str = Query(...)):
-    return forecast_service.get_forecast(location)
+def read_forecast(location: str = Query(...),
+                  detail: str = Query("daily", description="daily (per-day min/max/mean) or hourly (3-hour slots)")):
+    return forecast_service.get_forecast(location, detail)
+
+@router.post("/forecast/batch")
+def read_forecast_batch(batch: LocationBatch):
+    """5-day forecasts for many locations in one call; each result carries its own error flag."""
+    return forecast_service.get_forecast_batch(batch.locations)
 
 
 @router.get("/create_range")
 @router.post("/create_range")
-def create_range(location: str = Query(...), start_date: str = Query(...), end_date: str = Query(...)):
-    return weather_service.create_range(location, start_date, end_date)
+def create_range(location: str = Query(...), start_date: str = Query(...), end_date: str = Query(...),
+                 db: Session = Depends(get_db)):
+    return weather_service.create_range(db, location, start_date, end_date)
 
 
 @router.post("/delete_batch")
-def delete_batch(ids: str = Query(...)):
+def delete_batch(ids: str = Query(...), db: Session = Depends(get_db)):
     """Delete multiple records. Provide comma-separated IDs in the `ids` query param, e.g. ids=1,2,3"""
     try:
         ids_list = [int(x.strip()) for x in ids.split(',') if x.strip()]
     except Exception:
         return {"error": True, "message": "Invalid ids parameter."}
 
-    res = weather_service.delete_records(ids_list)
+    res = weather_service.delete_records(db, ids_list)
     return {"error": False, "result": res}
@@ -0,0 +1,310 @@
+"""In-memory columnar mirror of `weather_records` for analytical queries.
+
+The mirror keeps id, city code, temp and created_at as NumPy arrays (cities are
+dictionary-encoded to small integer codes). It is loaded at startup and kept in sync
+by the service layer: `write_records` adds rows after each committed insert and the
+delete helpers remove ids after each committed delete. `/history/query` then answers
+per-city summaries/percentiles, temperature histograms and trends with vectorized
+operations over the arrays instead of reading every row from the database.
+
+Each worker process has its own mirror and only sees its own writes. Every write bumps
+the history generation row, so before each query the mirror compares the database's
+(max id, generation), two index lookups, with the state it holds and reloads when
+another process has changed the table.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app import config
+from app.database import snapshot_session
+from app.models.history_model import HistoryGeneration, WeatherRecord
+
+INTERVALS = {"hour": "datetime64[h]", "day": "datetime64[D]"}
+
+
+def _db_version(db):
+    """(max id, generation) of the history table as `db` sees it; both are O(1) reads."""
+    max_id = db.scalar(select(func.max(WeatherRecord.id)))
+    generation = db.scalar(select(HistoryGeneration.value).where(HistoryGeneration.id == 1))
+    return max_id or 0, generation or 0
+
+
+def _as_utc64(ts: datetime):
+    # created_at is stored as naive UTC
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(ts, "s")
+
+
+class ColumnarHistory:
+    def __init__(self, enabled: bool = True, batch_size: int = 50000):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.loaded = False
+        # set when a write could not be mirrored; the next query reloads from the database
+        self.stale = False
+        # history generation the arrays reflect; every mirrored write bumps it
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # writes mirrored while a reload builds new arrays, replayed onto them before the swap
+        self._log = None
+        self._reset()
+
+    def _reset(self, capacity: int = 0):
+        self._n = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._city = np.empty(capacity, dtype=np.int32)
+        self._temp = np.empty(capacity, dtype=np.float64)
+        self._ts = np.empty(capacity, dtype="datetime64[s]")
+        self.cities = []
+        self._codes = {}
+
+    def __len__(self):
+        return self._n
+
+    def _code(self, city):
+        code = self._codes.get(city)
+        if code is None:
+            code = self._codes[city] = len(self.cities)
+            self.cities.append(city)
+        return code
+
+    def _reserve(self, extra: int):
+        needed = self._n + extra
+        if needed <= len(self._ids):
+            return
+        capacity = max(needed, 2 * len(self._ids), 1024)
+        for name in ("_ids", "_city", "_temp", "_ts"):
+            old = getattr(self, name)
+            grown = np.empty(capacity, dtype=old.dtype)
+            grown[:self._n] = old[:self._n]
+            setattr(self, name, grown)
+
+    def _append(self, ids, cities, temps, created):
+        m = len(ids)
+        self._reserve(m)
+        end = self._n + m
+        self._ids[self._n:end] = ids
+        self._city[self._n:end] = [self._code(c) for c in cities]
+        # NULL temps / timestamps become NaN / NaT and are skipped by the queries
+        self._temp[self._n:end] = np.array(temps, dtype=np.float64)
+        self._ts[self._n:end] = np.array(created, dtype="datetime64[s]")
+        self._n = end
+
+    def version(self):
+        """(max id, generation) of the mirrored rows, comparable to the database's."""
+        with self._lock:
+            return (int(self._ids[self._n - 1]) if self._n else 0), self._generation
+
+    def refresh(self):
+        """Reload when the table was changed by a write this process did not mirror."""
+        with snapshot_session() as db:
+            current = _db_version(db)
+        if self.stale or not self.loaded or current != self.version():
+            self.load()
+
+    def load(self):
+        """(Re)build the arrays from `weather_records`, streamed in batches.
+
+        The new arrays are built without holding the lock, so writes keep being mirrored
+        meanwhile; those writes are logged and replayed onto the new arrays before the swap.
+        """
+        if not self.enabled:
+            return
+        with self._load_lock:
+            with self._lock:
+                self._log = []
+            try:
+                built = self._build()
+                with self._lock:
+                    for op, *args in self._log:
+                        getattr(built, op)(*args)
+                    self._n, self._generation, self.stale = built._n, built._generation, built.stale
+                    self._ids, self._city, self._temp, self._ts = built._ids, built._city, built._temp, built._ts
+                    self.cities, self._codes = built.cities, built._codes
+                    self.loaded = True
+            finally:
+                with self._lock:
+                    self._log = None
+
+    def _build(self):
+        built = ColumnarHistory(self.enabled, self.batch_size)
+        # one snapshot, so the rows and the generation recorded with them agree
+        with snapshot_session() as db:
+            _max_id, built._generation = _db_version(db)
+            result = db.execute(
+                select(WeatherRecord.id, WeatherRecord.city, WeatherRecord.temp, WeatherRecord.created_at)
+                .order_by(WeatherRecord.id)
+                .execution_options(yield_per=self.batch_size)
+            )
+            for chunk in result.partitions():
+                ids, cities, temps, created = zip(*chunk)
+                built._append(ids, cities, temps, created)
+        return built
+
+    def _mirror(self, op, *args):
+        with self._lock:
+            getattr(self, op)(*args)
+            if self._log is not None:
+                self._log.append((op, *args))
+
+    def add(self, rows: list, ids: list = None):
+        """Mirror committed inserts; `ids` are the database ids of `rows`, in order."""
+        if self.loaded:
+            self._mirror("_add", rows, ids)
+
+    def remove(self, ids: list):
+        """Mirror committed deletes."""
+        if self.loaded:
+            self._mirror("_remove", ids)
+
+    def touch(self):
+        """Mirror a committed write to columns the mirror does not hold (e.g. desc)."""
+        if self.loaded:
+            self._mirror("_touch")
+
+    # every committed write bumps the history generation once; the helpers below skip
+    # the bump when a reload already picked up the write (and with it, the bump)
+
+    def _add(self, rows, ids):
+        if ids is None:
+            self.stale = True
+            return
+        # ids are assigned in increasing order, so any a reload already picked up are skipped
+        last = self._ids[self._n - 1] if self._n else 0
+        fresh = [(i, r) for i, r in zip(ids, rows) if i > last]
+        if fresh:
+            self._append([i for i, _ in fresh], [r.get("city") for _, r in fresh],
+                         [r.get("temp") for _, r in fresh], [r.get("created_at") for _, r in fresh])
+            self._generation += 1
+
+    def _remove(self, ids):
+        found = np.isin(self._ids[:self._n], np.asarray(ids, dtype=np.int64))
+        if ids and not found.any():
+            return
+        self._generation += 1
+        keep = ~found
+        # boolean indexing copies, so snapshots taken by running queries stay intact
+        self._ids, self._city = self._ids[:self._n][keep], self._city[:self._n][keep]
+        self._temp, self._ts = self._temp[:self._n][keep], self._ts[:self._n][keep]
+        self._n = len(self._ids)
+
+    def _touch(self):
+        self._generation += 1
+
+    def _select(self, city: str = None, since: datetime = None, until: datetime = None):
+        """Filtered (city code, temp, timestamp) arrays; rows without a temp are dropped."""
+        if self.stale:
+            self.load()
+        with self._lock:
+            n, cities = self._n, list(self.cities)
+            codes, temps, ts = self._city[:n], self._temp[:n], self._ts[:n]
+        mask = ~np.isnan(temps)
+        if city:
+            code = self._codes.get(city)
+            if code is None:
+                return cities, codes[:0], temps[:0], ts[:0]
+            mask &= codes == code
+        if since:
+            mask &= ts >= _as_utc64(since)
+        if until:
+            mask &= ts < _as_utc64(until)
+        return cities, codes[mask], temps[mask], ts[mask]
+
+    def summary(self, city: str = None, since: datetime = None, until: datetime = None,
+                percentiles=(50, 90, 99)):
+        """Per-city count/min/max/mean/std and temperature percentiles (linear interpolation)."""
+        cities, codes, temps, _ts = self._select(city, since, until)
+        if not len(temps):
+            return []
+        # sort by (city, temp) once; every city is then a contiguous, ordered run
+        order = np.lexsort((temps, codes))
+        codes, temps = codes[order], temps[order]
+        city_codes, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+        ends = starts + counts - 1
+        means = np.add.reduceat(temps, starts) / counts
+        squares = np.add.reduceat(temps * temps, starts) / counts
+        stds = np.sqrt(np.maximum(squares - means * means, 0.0))
+
+        quantiles = {}
+        for q in percentiles:
+            pos = starts + (q / 100.0) * (counts - 1)
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.ceil(pos).astype(np.int64)
+            quantiles[f"p{q:g}"] = np.round(temps[lo] + (temps[hi] - temps[lo]) * (pos - lo), 2).tolist()
+
+        columns = zip(city_codes.tolist(), counts.tolist(), temps[starts].tolist(), temps[ends].tolist(),
+                      np.round(means, 2).tolist(), np.round(stds, 2).tolist())
+        out = []
+        for i, (code, count, lo, hi, mean, std) in enumerate(columns):
+            entry = {"city": cities[code], "count": count, "min": lo, "max": hi, "mean": mean, "std": std}
+            entry.update({name: values[i] for name, values in quantiles.items()})
+            out.append(entry)
+        return sorted(out, key=lambda e: e["city"] or "")
+
+    def histogram(self, city: str = None, since: datetime = None, until: datetime = None, bins: int = 20):
+        """Temperature distribution as `bins` equal-width buckets."""
+        _cities, _codes, temps, _ts = self._select(city, since, until)
+        if not len(temps):
+            return {"edges": [], "counts": []}
+        counts, edges = np.histogram(temps, bins=bins)
+        return {"edges": np.round(edges, 2).tolist(), "counts": counts.tolist()}
+
+    def trend(self, city: str = None, since: datetime = None, until: datetime = None, interval: str = "day"):
+        """Mean temperature per hour/day plus the least-squares slope in degrees per day."""
+        _cities, _codes, temps, ts = self._select(city, since, until)
+        valid = ~np.isnat(ts)
+        temps, ts = temps[valid], ts[valid]
+        if not len(temps):
+            return {"slope_per_day": None, "buckets": []}
+        buckets, bucket = np.unique(ts.astype(INTERVALS[interval]), return_inverse=True)
+        counts = np.bincount(bucket)
+        means = np.bincount(bucket, weights=temps) / counts
+
+        slope = None
+        days = (ts - ts.min()).astype(np.float64) / 86400.0
+        if np.ptp(days) > 0:
+            slope = round(float(np.polyfit(days, temps, 1)[0]), 4)
+        columns = zip(buckets.astype("datetime64[s]").tolist(), counts.tolist(), np.round(means, 2).tolist())
+        return {
+            "slope_per_day": slope,
+            "buckets": [{"bucket": b.isoformat(), "count": c, "mean": m} for b, c, m in columns],
+        }
+
+
+columnar = ColumnarHistory(enabled=config.HISTORY_COLUMNAR, batch_size=config.EXPORT_ARROW_BATCH_SIZE)
+
+QUERY_OPS = ("summary", "histogram", "trend")
+
+
+def run_query(op: str, city: str = None, since: datetime = None, until: datetime = None,
+              percentiles=(50, 90, 99), bins: int = 20, interval: str = "day"):
+    """Dispatch a /history/query request; raises ValueError for invalid arguments."""
+    if not columnar.enabled:
+        raise ValueError("The columnar history mirror is disabled (HISTORY_COLUMNAR=false).")
+    if op not in QUERY_OPS:
+        raise ValueError(f"Unknown op '{op}'; use one of: {', '.join(QUERY_OPS)}.")
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown interval '{interval}'; use one of: {', '.join(INTERVALS)}.")
+    if any(not 0 <= q <= 100 for q in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100.")
+    columnar.refresh()
+
+    started = time.perf_counter()
+    if op == "summary":
+        result = columnar.summary(city, since, until, percentiles)
+    elif op == "histogram":
+        result = columnar.histogram(city, since, until, bins)
+    else:
+        result = columnar.trend(city, since, until, interval)
+    return {
+        "op": op,
+        "rows": len(columnar),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        "result": result,
+    }
@@ -0,0 +1,192 @@
+"""Background export jobs with cached, versioned artifacts.
+
+Jobs run on a small worker pool so slow formats (PDF in particular) never tie up a
+request worker. Each finished artifact is stored under a name derived from the
+format and the current history version, so exporting unchanged data again is served
+from disk immediately and identical in-flight jobs are shared.
+
+The history version is (max id, row count, generation). The generation is a row in
+the database bumped by invalidate_artifacts() in the same transaction as every write
+to the table, since updates and deletes can leave max id and count unchanged; being
+persisted, it is shared by all workers and survives restarts (the columnar mirror
+uses it as its change marker too). A build reads the version and the rows
+from one snapshot, so an artifact always holds exactly the data its name claims.
+
+The newest EXPORT_ARTIFACT_KEEP artifacts per format are kept on disk, so a download
+of a slightly older version that is still in progress is not cut off.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select, update
+
+from app import config
+from app.database import SessionLocal, snapshot_session
+from app.models.history_model import HistoryGeneration, WeatherRecord
+from app.services.export_service import iter_record_rows
+from app.utils.export_utils import ARROW_FIELDS, ARROW_FORMATS, STREAM_ENCODERS, write_arrow, write_pdf, write_stream
+from app.utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+JOB_FORMATS = ("pdf",) + tuple(ARROW_FORMATS) + tuple(STREAM_ENCODERS)
+
+_executor = ThreadPoolExecutor(max_workers=config.EXPORT_WORKERS, thread_name_prefix="export")
+_lock = threading.Lock()
+_jobs = OrderedDict()  # job id -> job dict, oldest first
+_active = {}           # (format, version) -> job id of a queued/running job
+
+export_duration = Histogram("skycast_export_duration_seconds",
+                            "Time to produce an export (file build or full stream), by format.", ("format",),
+                            buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+
+
+def invalidate_artifacts(db):
+    """Bump the history generation; call before committing any write to weather_records."""
+    bumped = db.execute(update(HistoryGeneration).where(HistoryGeneration.id == 1)
+                        .values(value=HistoryGeneration.value + 1)).rowcount
+    if not bumped:
+        db.add(HistoryGeneration(id=1, value=1))
+
+
+def history_version(db=None):
+    """Return (version string, row count) for the state of the history table `db` sees."""
+    own = db is None
+    db = SessionLocal() if own else db
+    try:
+        max_id, count = db.query(func.max(WeatherRecord.id), func.count(WeatherRecord.id)).one()
+        generation = db.scalar(select(HistoryGeneration.value).where(HistoryGeneration.id == 1))
+    finally:
+        if own:
+            db.close()
+    return f"{max_id or 0}-{count}-{generation or 0}", count
+
+
+def artifact_path(format_type: str, version: str):
+    return os.path.join(config.EXPORT_DIR, f"weather_records-{version}.{format_type}")
+
+
+def build_artifact(format_type: str, on_row=None, on_version=None):
+    """Write the artifact for the current history unless it already exists.
+
+    Returns (path, version). `on_version(version, total)` is called once the snapshot
+    the artifact is built from has been taken.
+    """
+    with snapshot_session() as db:
+        version, total = history_version(db)
+        if on_version:
+            on_version(version, total)
+        path = artifact_path(format_type, version)
+        if os.path.exists(path):
+            return path, version
+        os.makedirs(config.EXPORT_DIR, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        started = time.perf_counter()
+        try:
+            if format_type in ARROW_FORMATS:
+                rows = iter_record_rows(fields=ARROW_FIELDS, db=db)
+                write_arrow(format_type, rows, tmp_path, config.EXPORT_ARROW_BATCH_SIZE, on_row)
+            elif format_type == "pdf":
+                write_pdf(iter_record_rows(db=db), tmp_path, on_row)
+            else:
+                write_stream(format_type, _counted(iter_record_rows(db=db), on_row), tmp_path)
+            # atomic rename: readers only ever see complete artifacts
+            os.replace(tmp_path, path)
+            export_duration.observe(time.perf_counter() - started, format=format_type)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    _prune(format_type)
+    return path, version
+
+
+def _counted(rows, on_row):
+    for n, row in enumerate(rows, 1):
+        yield row
+        if on_row:
+            on_row(n)
+
+
+def _prune(format_type: str):
+    """Delete all but the newest EXPORT_ARTIFACT_KEEP artifacts of `format_type`."""
+    paths = glob.glob(os.path.join(config.EXPORT_DIR, f"weather_records-*.{format_type}"))
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.path.getmtime(path)
+        except OSError:
+            pass
+    newest_first = sorted(mtimes, key=mtimes.get, reverse=True)
+    for old in newest_first[max(config.EXPORT_ARTIFACT_KEEP, 1):]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+
+def _run(job_id: str, key: tuple):
+    with _lock:
+        job = _jobs[job_id]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+
+    def on_row(n):
+        job["rows"] = n
+        if job["total"]:
+            job["progress"] = round(min(n / job["total"], 1.0), 4)
+
+    def on_version(version, total):
+        # the version submit() saw may be older than the snapshot the build reads
+        job["version"], job["total"] = version, total
+
+    try:
+        job["path"], _ = build_artifact(job["format"], on_row, on_version)
+        job["status"], job["progress"] = "done", 1.0
+    except Exception as e:
+        logger.exception("Export job %s failed", job_id)
+        job["status"], job["error"] = "failed", str(e)
+    finally:
+        job["finished_at"] = time.time()
+        with _lock:
+            _active.pop(key, None)
+
+
+def submit(format_type: str):
+    """Queue an export of the current history; returns the job (possibly already done or shared)."""
+    version, total = history_version()
+    key = (format_type, version)
+    with _lock:
+        if key in _active:
+            return _jobs[_active[key]]
+
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "format": format_type, "version": version, "status": "queued",
+               "progress": 0.0, "rows": 0, "total": total, "path": None, "error": None,
+               "created_at": time.time(), "started_at": None, "finished_at": None}
+        path = artifact_path(format_type, version)
+        if os.path.exists(path):
+            job.update(status="done", progress=1.0, rows=total, path=path, finished_at=time.time())
+        else:
+            _active[key] = job_id
+        _jobs[job_id] = job
+        while len(_jobs) > config.EXPORT_JOB_HISTORY:
+            _jobs.popitem(last=False)
+
+    if job["status"] == "queued":
+        _executor.submit(_run, job_id, key)
+    return job
+
+
+def get_job(job_id: str):
+    return _jobs.get(job_id)
+
+
+def public_view(job: dict):
+    """Job fields safe to return to clients (no server paths)."""
+    return {k: v for k, v in job.items() if k != "path"}
@@ -0,0 +1,28 @@
+from app import config
+from app.database import SessionLocal
+from app.models.history_model import WeatherRecord
+from app.utils.export_utils import EXPORT_FIELDS
+
+
+def iter_record_rows(batch_size: int = None, fields=EXPORT_FIELDS, db=None):
+    """
+    Yield tuples of `fields` (default: id, city, temp, desc) for every record in id order,
+    fetched from the database in batches of `batch_size` (yield_per) rather than
+    materialized at once.
+
+    Opens its own session unless `db` is given: a streaming response keeps iterating
+    after the request's dependency-scoped session has been closed.
+    """
+    own = db is None
+    db = SessionLocal() if own else db
+    try:
+        query = (
+            db.query(*(getattr(WeatherRecord, name) for name in fields))
+            .order_by(WeatherRecord.id)
+            .yield_per(batch_size or config.EXPORT_BATCH_SIZE)
+        )
+        for row in query:
+            yield tuple(row)
+    finally:
+        if own:
+            db.close()
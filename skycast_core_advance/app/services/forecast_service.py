@@ -1,22 +1,50 @@
-import requests, os
+import httpx, os
 from dotenv import load_dotenv
+from app import config
+from app.utils.batch import batch_response, fan_out
+from app.utils.cache import TTLCache, next_slot_expiry
+from app.utils.cache_warmer import warmer
+from app.utils.forecast_aggregate import DETAILS, aggregate
+from app.utils.http_client import get_client
+from app.utils.location import location_key
+from app.utils.scheduler import BULK, upstream_priority
+from app.utils.resilience import serve, stale_fields
 load_dotenv()
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-def get_forecast(location: str):
-    url = f"https://api.openweathermap.org/data/2.5/forecast?q={location}&appid={API_KEY}&units=metric"
-    r = requests.get(url)
-    if r.status_code != 200:
+# aggregated daily/hourly views, valid until OWM publishes the next 3-hour forecast slot
+forecast_cache = TTLCache(maxsize=config.FORECAST_CACHE_SIZE, stale_ttl=config.CACHE_STALE_TTL)
+
+def get_forecast(location: str, detail: str = "daily"):
+    """5-day forecast aggregated per day (`detail="daily"`) or as the raw 3-hour slots ("hourly")."""
+    if detail not in DETAILS:
+        return {"error": True, "message": f"detail must be one of: {', '.join(DETAILS)}"}
+    key = location_key(location)
+    warmer.track("forecast", key, location)
+    views, age = serve(forecast_cache, key, "forecast:" + key, _fetch_forecast, location, key)
+    if views is None:
         return {"error": True, "message": "Forecast fetch failed."}
+    return {"error": False, "forecast": views[detail], **stale_fields(age)}
+
+
+def _fetch_forecast(location: str, key: str):
+    try:
+        r = get_client().get("/forecast", params={"q": location, "appid": API_KEY, "units": "metric"})
+    except httpx.HTTPError:
+        return None
+    if r.status_code != 200:
+        return None
     data = r.json()
-    seen, forecast = set(), []
-    for entry in data["list"]:
-        date = entry["dt_txt"].split(" ")[0]
-        if date not in seen:
-            seen.add(date)
-            forecast.append({
-                "date": date,
-                "temp": entry["main"]["temp"],
-                "description": entry["weather"][0]["description"]
-            })
-    return {"error": False, "forecast": forecast[:5]}
+    views = aggregate(data["list"])
+    forecast_cache.set(key, views, expires_at=next_slot_expiry(data["list"]))
+    return views
+
+
+# popular locations are refreshed in the background shortly before they expire
+warmer.register("forecast", forecast_cache, _fetch_forecast)
+
+
+def get_forecast_batch(locations: list):
+    """5-day forecasts for many locations, fetched concurrently on the bounded batch pool."""
+    with upstream_priority(BULK):
+        return batch_response(locations, fan_out(get_forecast, locations))
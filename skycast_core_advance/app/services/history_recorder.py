@@ -0,0 +1,179 @@
+"""Write-behind recording of weather lookups into `weather_records`.
+
+In "buffered" mode lookups only enqueue a row; a background thread bulk-inserts the
+queue whenever it reaches HISTORY_FLUSH_SIZE rows or HISTORY_FLUSH_INTERVAL seconds
+have passed, and drains it on shutdown. A batch whose write fails is kept and retried
+with exponential backoff (the queue filling up meanwhile pushes callers onto inline
+writes); on shutdown it gets HISTORY_SHUTDOWN_ATTEMPTS more tries. In "sync" mode (or when the recorder is not
+running, or its queue is full) rows are written inside the caller's transaction.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import config
+from app.database import SessionLocal
+from app.models.history_model import WeatherRecord
+from app.services import rollup_service
+from app.services.columnar_history import columnar
+from app.services.export_jobs import invalidate_artifacts
+
+logger = logging.getLogger(__name__)
+
+
+def write_records(db: Session, rows: list):
+    """
+    Bulk-insert `rows` (dicts of WeatherRecord columns), fold them into the rollups and
+    commit; the committed rows are then mirrored into the columnar store.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault("created_at", now)
+    ids = None
+    if columnar.loaded and db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        # the mirror needs the generated ids, in the order of `rows`
+        stmt = insert(WeatherRecord).returning(WeatherRecord.id, sort_by_parameter_order=True)
+        ids = db.execute(stmt, rows).scalars().all()
+    else:
+        db.execute(insert(WeatherRecord), rows)
+    rollup_service.apply_inserts(db, rows)
+    invalidate_artifacts(db)
+    db.commit()
+    columnar.add(rows, ids)
+
+
+class HistoryRecorder:
+    def __init__(self, maxsize: int, flush_size: int, flush_interval: float):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker after it has flushed everything still queued."""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def enqueue(self, rows: list):
+        """Queue rows for the worker; returns the rows that did not fit."""
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                return rows[i:]
+        return []
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _drain(self, limit: int):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, rows: list):
+        """Write one batch; returns False when it was rolled back and must be retried."""
+        db = SessionLocal()
+        try:
+            write_records(db, rows)
+        except Exception:
+            db.rollback()
+            self.failed_flushes += 1
+            logger.exception("Failed to flush %d buffered history rows", len(rows))
+            return False
+        finally:
+            db.close()
+        self.flushed += len(rows)
+        return True
+
+    def _flush_with_retry(self, rows: list):
+        """Flush until it succeeds, backing off between attempts; gives up only when stopping."""
+        delay = config.HISTORY_RETRY_BACKOFF
+        while not self._flush(rows):
+            if self._stop.wait(delay):
+                return False
+            delay = min(delay * 2, config.HISTORY_RETRY_BACKOFF_MAX)
+        return True
+
+    def _flush_on_shutdown(self, rows: list):
+        delay = config.HISTORY_RETRY_BACKOFF
+        for attempt in range(1, config.HISTORY_SHUTDOWN_ATTEMPTS + 1):
+            if self._flush(rows):
+                return
+            if attempt < config.HISTORY_SHUTDOWN_ATTEMPTS:
+                time.sleep(delay)
+                delay = min(delay * 2, config.HISTORY_RETRY_BACKOFF_MAX)
+        self.dropped += len(rows)
+        logger.error("Giving up on %d buffered history rows after %d attempts at shutdown: %r",
+                     len(rows), config.HISTORY_SHUTDOWN_ATTEMPTS, rows)
+
+    def _run(self):
+        batch, deadline = [], None
+        while not self._stop.is_set():
+            timeout = 0.5 if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.extend(self._drain(self.flush_size - len(batch)))
+            except queue.Empty:
+                pass
+            if batch and (len(batch) >= self.flush_size or time.monotonic() >= deadline):
+                # a batch still failing when stop() is called is retried below
+                if self._flush_with_retry(batch):
+                    batch, deadline = [], None
+
+        batch.extend(self._drain(self._queue.qsize()))
+        while batch:
+            self._flush_on_shutdown(batch[:self.flush_size])
+            batch = batch[self.flush_size:]
+
+
+recorder = HistoryRecorder(
+    maxsize=config.HISTORY_QUEUE_SIZE,
+    flush_size=config.HISTORY_FLUSH_SIZE,
+    flush_interval=config.HISTORY_FLUSH_INTERVAL,
+)
+
+
+def record_lookups(db: Session, rows: list):
+    """
+    Record weather lookups according to HISTORY_WRITE_MODE. `created_at` is stamped
+    here so buffered rows keep the time of the lookup, not of the flush.
+    """
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault("created_at", now)
+    if config.HISTORY_WRITE_MODE == "buffered" and recorder.running:
+        rows = recorder.enqueue(rows)
+    # sync mode, recorder not started, or queue full (backpressure): write inline
+    write_records(db, rows)
@@ -1,22 +1,76 @@
-from app.database import SessionLocal
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
 from app.models.history_model import WeatherRecord
-from app.utils.dsa_structures import sort_history_by_temp
+from app.services.columnar_history import columnar
+from app.services.export_jobs import invalidate_artifacts
+from app.services.rollup_service import apply_deletes
 
-def get_all_history(sort=False):
-    db = SessionLocal()
-    records = db.query(WeatherRecord).all()
-    if sort:
-        records = sort_history_by_temp(records)
-    db.close()
-    return records
+def _filtered(db: Session, city: str = None, since: datetime = None, until: datetime = None):
+    query = db.query(WeatherRecord)
+    if city:
+        query = query.filter(WeatherRecord.city == city)
+    if since:
+        query = query.filter(WeatherRecord.created_at >= since)
+    if until:
+        query = query.filter(WeatherRecord.created_at < until)
+    return query
 
-def delete_history(record_id: int):
-    db = SessionLocal()
+def get_history_page(db: Session, limit: int, after_id: int = None, city: str = None,
+                     since: datetime = None, until: datetime = None):
+    """
+    One page of history in id order using keyset pagination: rows with id > after_id,
+    optionally filtered by city and created_at range. Returns (records, next_after_id),
+    where next_after_id is None on the last page.
+    """
+    query = _filtered(db, city, since, until)
+    if after_id is not None:
+        query = query.filter(WeatherRecord.id > after_id)
+
+    # fetch one extra row to know whether another page exists
+    records = query.order_by(WeatherRecord.id).limit(limit + 1).all()
+    if len(records) > limit:
+        records = records[:limit]
+        return records, records[-1].id
+    return records, None
+
+def get_history_page_by_temp(db: Session, limit: int, after_id: int = None, after_temp: float = None,
+                             city: str = None, since: datetime = None, until: datetime = None):
+    """
+    Like get_history_page but ordered by (temp, id) in SQL, walking the temp index.
+    The cursor is the (temp, id) of the last row; `after_temp` is looked up from
+    `after_id` when omitted. Returns (records, next_cursor) with next_cursor a
+    (temp, id) tuple or None.
+    """
+    query = _filtered(db, city, since, until)
+    if after_id is not None:
+        if after_temp is None:
+            after_temp = db.query(WeatherRecord.temp).filter(WeatherRecord.id == after_id).scalar()
+            if after_temp is None:
+                raise ValueError(f"Unknown cursor record {after_id}; pass after_temp as well.")
+        query = query.filter(tuple_(WeatherRecord.temp, WeatherRecord.id) > tuple_(after_temp, after_id))
+
+    records = query.order_by(WeatherRecord.temp, WeatherRecord.id).limit(limit + 1).all()
+    if len(records) > limit:
+        records = records[:limit]
+        return records, (records[-1].temp, records[-1].id)
+    return records, None
+
+def get_extremes(db: Session, k: int, city: str = None):
+    """Top-k hottest and coldest readings, each a LIMIT k scan over the (city,) temp index."""
+    query = _filtered(db, city)
+    return {
+        "hottest": query.order_by(WeatherRecord.temp.desc(), WeatherRecord.id).limit(k).all(),
+        "coldest": query.order_by(WeatherRecord.temp, WeatherRecord.id).limit(k).all(),
+    }
+
+def delete_history(db: Session, record_id: int):
     record = db.query(WeatherRecord).filter(WeatherRecord.id == record_id).first()
     if record:
         db.delete(record)
+        apply_deletes(db, [record])
+        invalidate_artifacts(db)
         db.commit()
-        db.close()
+        columnar.remove([record_id])
         return True
-    db.close()
     return False
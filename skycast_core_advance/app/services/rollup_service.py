@@ -0,0 +1,188 @@
+"""Per-city hourly and daily temperature rollups of `weather_records`.
+
+The rollup tables are updated in the same transaction as the rows they summarize:
+`apply_inserts` upserts (count, sum, min, max) deltas per bucket and `apply_deletes`
+subtracts them, recomputing a bucket from its raw rows only when a deleted reading
+could have been its min or max. Analytics then read O(buckets) instead of O(rows).
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import config
+from app.database import SessionLocal
+from app.models.history_model import WeatherRecord
+from app.models.rollup_model import DailyRollup, HourlyRollup
+
+# granularity -> (table, bucket width)
+GRANULARITIES = {
+    "hour": (HourlyRollup, timedelta(hours=1)),
+    "day": (DailyRollup, timedelta(days=1)),
+}
+
+
+def bucket_start(ts: datetime, granularity: str):
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _field(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+def _deltas(rows, granularity: str):
+    """Aggregate rows into {(city, bucket): [count, sum, min, max]}; rows without a temp are skipped."""
+    acc = {}
+    for row in rows:
+        city, temp, created_at = _field(row, "city"), _field(row, "temp"), _field(row, "created_at")
+        if city is None or temp is None or created_at is None:
+            continue
+        key = (city, bucket_start(created_at, granularity))
+        d = acc.get(key)
+        if d is None:
+            acc[key] = [1, temp, temp, temp]
+        else:
+            d[0] += 1
+            d[1] += temp
+            d[2] = min(d[2], temp)
+            d[3] = max(d[3], temp)
+    return acc
+
+
+def _upsert(db: Session, model, deltas: dict):
+    values = [
+        {"city": city, "bucket": bucket, "count": n, "temp_sum": s, "temp_min": lo, "temp_max": hi}
+        for (city, bucket), (n, s, lo, hi) in deltas.items()
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            stmt, least, greatest = sqlite.insert(model), func.min, func.max
+        else:
+            stmt, least, greatest = postgresql.insert(model), func.least, func.greatest
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(index_elements=["city", "bucket"], set_={
+            "count": model.count + new.count,
+            "temp_sum": model.temp_sum + new.temp_sum,
+            "temp_min": least(model.temp_min, new.temp_min),
+            "temp_max": greatest(model.temp_max, new.temp_max),
+        })
+        db.execute(stmt, values)
+        return
+
+    # no native upsert: read-modify-write each touched bucket
+    for v in values:
+        row = db.get(model, (v["city"], v["bucket"]), populate_existing=True)
+        if row is None:
+            db.add(model(**v))
+            continue
+        row.count += v["count"]
+        row.temp_sum += v["temp_sum"]
+        row.temp_min = min(row.temp_min, v["temp_min"])
+        row.temp_max = max(row.temp_max, v["temp_max"])
+
+
+def _recompute(db: Session, model, width: timedelta, city: str, bucket: datetime):
+    """Rebuild one bucket from its raw rows (an index range scan on city, created_at)."""
+    n, s, lo, hi = db.query(
+        func.count(WeatherRecord.temp), func.sum(WeatherRecord.temp),
+        func.min(WeatherRecord.temp), func.max(WeatherRecord.temp),
+    ).filter(
+        WeatherRecord.city == city,
+        WeatherRecord.created_at >= bucket,
+        WeatherRecord.created_at < bucket + width,
+    ).one()
+    row = db.get(model, (city, bucket), populate_existing=True)
+    if not n:
+        if row is not None:
+            db.delete(row)
+        return
+    if row is None:
+        row = model(city=city, bucket=bucket)
+        db.add(row)
+    row.count, row.temp_sum, row.temp_min, row.temp_max = n, s, lo, hi
+
+
+def apply_inserts(db: Session, rows: list):
+    """Fold newly inserted rows (dicts or objects with city, temp, created_at) into the rollups."""
+    for granularity, (model, _width) in GRANULARITIES.items():
+        deltas = _deltas(rows, granularity)
+        if deltas:
+            _upsert(db, model, deltas)
+
+
+def apply_deletes(db: Session, rows: list):
+    """Remove deleted rows from the rollups; call after the rows are gone, before commit."""
+    db.flush()
+    for granularity, (model, width) in GRANULARITIES.items():
+        for (city, bucket), (n, s, lo, hi) in _deltas(rows, granularity).items():
+            row = db.get(model, (city, bucket), populate_existing=True)
+            if row is None:
+                continue
+            if row.count <= n or lo <= row.temp_min or hi >= row.temp_max:
+                # the bucket's min or max may have been deleted
+                _recompute(db, model, width, city, bucket)
+            else:
+                row.count -= n
+                row.temp_sum -= s
+
+
+def rebuild(db: Session, batch_size: int = None):
+    """Recompute every rollup from `weather_records` in one pass."""
+    for model, _width in GRANULARITIES.values():
+        db.query(model).delete()
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    result = db.execute(
+        select(WeatherRecord.city, WeatherRecord.temp, WeatherRecord.created_at)
+        .order_by(WeatherRecord.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for chunk in result.partitions():
+        apply_inserts(db, chunk)
+    db.commit()
+
+
+def ensure_rollups():
+    """Rebuild the rollups at startup when they do not cover the rows in `weather_records`."""
+    db = SessionLocal()
+    try:
+        expected = db.query(func.count(WeatherRecord.id)).filter(
+            WeatherRecord.city.isnot(None), WeatherRecord.temp.isnot(None), WeatherRecord.created_at.isnot(None),
+        ).scalar()
+        covered = db.query(func.coalesce(func.sum(DailyRollup.count), 0)).scalar()
+        if expected != covered:
+            rebuild(db)
+    finally:
+        db.close()
+
+
+def get_rollup_stats(db: Session, granularity: str = "day", city: str = None,
+                     start: datetime = None, end: datetime = None):
+    """
+    Per-city min/max/avg temperature for each bucket overlapping [start, end), read from
+    the rollup table for `granularity` ("hour" or "day").
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'; use one of: {', '.join(GRANULARITIES)}.")
+    model, _width = GRANULARITIES[granularity]
+    query = db.query(model)
+    if city:
+        query = query.filter(model.city == city)
+    if start:
+        query = query.filter(model.bucket >= bucket_start(start, granularity))
+    if end:
+        query = query.filter(model.bucket < end)
+    return [
+        {
+            "city": r.city,
+            "bucket": r.bucket.isoformat(),
+            "count": r.count,
+            "min": r.temp_min,
+            "max": r.temp_max,
+            "avg": round(r.temp_sum / r.count, 2),
+        }
+        for r in query.order_by(model.city, model.bucket)
+    ]
@@ -1,103 +1,218 @@
-import requests, os
+import httpx, os, time
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from app.database import SessionLocal
+from app import config
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
 from app.models.history_model import WeatherRecord
+from app.services.columnar_history import columnar
+from app.services.export_jobs import invalidate_artifacts
+from app.services.forecast_service import get_forecast
+from app.services.history_recorder import record_lookups, write_records
+from app.services.history_service import get_history_page
+from app.services.rollup_service import apply_deletes
 from app.utils.dsa_structures import Stack
 from app.utils.export_utils import export_data
+from app.utils.batch import batch_response, fan_out
+from app.utils.cache import TTLCache
+from app.utils.cache_warmer import warmer
+from app.utils.http_client import get_client
+from app.utils.location import location_key
+from app.utils.scheduler import BULK, UpstreamThrottled, upstream_priority
+from app.utils.resilience import serve, stale_fields
 
 load_dotenv()
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
-# CREATE + READ helpers
-def get_current_weather(location: str):
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={API_KEY}&units=metric"
-    res = requests.get(url)
+# SQLite allows 999 bound parameters per statement on older builds
+DELETE_CHUNK_SIZE = 500
+
+# upstream payloads are reused for a while; every lookup is still recorded in history
+weather_cache = TTLCache(maxsize=config.WEATHER_CACHE_SIZE, ttl=config.WEATHER_CACHE_TTL, stale_ttl=config.CACHE_STALE_TTL)
+
+
+def fetch_current_weather(location: str):
+    """
+    Return (payload, age) for `location`: the OWM current-weather payload (None on failure)
+    and, when an expired copy is served while it is refreshed in the background, its age.
+    """
+    key = location_key(location)
+    warmer.track("weather", key, location)
+    # concurrent misses for the same location share one upstream call
+    return serve(weather_cache, key, "weather:" + key, _fetch_current_weather, location, key)
+
+
+def _fetch_current_weather(location: str, key: str):
+    try:
+        res = get_client().get("/weather", params={"q": location, "appid": API_KEY, "units": "metric"})
+    except httpx.HTTPError:
+        return None
     if res.status_code != 200:
-        return {"error": True, "message": "Invalid location or API issue."}
+        return None
     data = res.json()
+    weather_cache.set(key, data)
+    return data
 
-    db = SessionLocal()
-    record = WeatherRecord(city=data["name"], temp=data["main"]["temp"], desc=data["weather"][0]["description"])
-    db.add(record)
-    db.commit()
-    db.refresh(record)
-    db.close()
 
-    return {"error": False, "data": data}
+# popular locations are refreshed in the background shortly before they expire
+warmer.register("weather", weather_cache, _fetch_current_weather)
 
 
-def get_all_records():
-    db = SessionLocal()
-    records = db.query(WeatherRecord).all()
-    db.close()
+def _history_row(data: dict):
+    return {"city": data["name"], "temp": data["main"]["temp"], "desc": data["weather"][0]["description"]}
+
+
+# CREATE + READ helpers
+def get_current_weather(db: Session, location: str):
+    data, age = fetch_current_weather(location)
+    if data is None:
+        return {"error": True, "message": "Invalid location or API issue."}
+
+    record_lookups(db, [_history_row(data)])
+
+    return {"error": False, "data": data, **stale_fields(age)}
+
+
+def get_current_weather_batch(db: Session, locations: list):
+    """
+    Current weather for many locations: upstream fetches run concurrently on the bounded
+    batch pool, then all history rows for the batch are recorded together
+    (one transaction in sync mode).
+    """
+    with upstream_priority(BULK):
+        payloads = fan_out(fetch_current_weather, locations)
+    results, rows = [], []
+    for payload in payloads:
+        if isinstance(payload, UpstreamThrottled):
+            # reported with its retry_after by batch_response
+            results.append(payload)
+            continue
+        data, age = (None, None) if isinstance(payload, Exception) else payload
+        if data is None:
+            results.append({"error": True, "message": "Invalid location or API issue."})
+            continue
+        rows.append(_history_row(data))
+        results.append({"error": False, "data": data, **stale_fields(age)})
+
+    record_lookups(db, rows)
+
+    return batch_response(locations, results)
+
+
+def get_all_records(db: Session, limit: int, after_id: int = None, city: str = None,
+                    since: datetime = None, until: datetime = None):
+    """One keyset-paginated page of records; pass `next_after_id` back as `after_id` for the next."""
+    records, next_after_id = get_history_page(db, limit, after_id, city, since, until)
     stack = Stack()
     for r in records:
         stack.push({"id": r.id, "city": r.city, "temp": r.temp, "desc": r.desc})
-    return {"count": len(records), "records": stack.items}
+    return {"count": len(records), "next_after_id": next_after_id, "records": stack.items}
 
 
-def update_record(record_id: int, new_desc: str):
-    db = SessionLocal()
+def update_record(db: Session, record_id: int, new_desc: str):
     record = db.query(WeatherRecord).filter(WeatherRecord.id == record_id).first()
     if not record:
-        db.close()
         return {"error": True, "message": "Record not found."}
     record.desc = new_desc
+    invalidate_artifacts(db)
     db.commit()
-    db.refresh(record)
-    db.close()
+    columnar.touch()
     return {"error": False, "message": "Updated successfully."}
 
 
-def delete_record(record_id: int):
-    db = SessionLocal()
+def delete_record(db: Session, record_id: int):
     record = db.query(WeatherRecord).filter(WeatherRecord.id == record_id).first()
     if not record:
-        db.close()
         return {"error": True, "message": "Record not found."}
     db.delete(record)
+    apply_deletes(db, [record])
+    invalidate_artifacts(db)
     db.commit()
-    db.close()
+    columnar.remove([record_id])
     return {"error": False, "message": "Deleted successfully."}
 
 
-def delete_records(ids: list):
+# columns handed back by set-based deletes: the id plus what the rollups need
+_DELETED_COLUMNS = (WeatherRecord.id, WeatherRecord.city, WeatherRecord.temp, WeatherRecord.created_at)
+
+
+def _delete_returning(db: Session, *criteria):
+    """
+    DELETE FROM weather_records WHERE <criteria> as one statement and subtract the
+    deleted rows from the rollups; returns the deleted (id, city, temp, created_at) rows.
+    """
+    stmt = delete(WeatherRecord).where(*criteria)
+    if db.get_bind().dialect.delete_returning:
+        rows = db.execute(stmt.returning(*_DELETED_COLUMNS)).all()
+    else:
+        # older SQLite without RETURNING: read the matching rows inside the same transaction
+        rows = db.query(*_DELETED_COLUMNS).filter(*criteria).all()
+        db.execute(stmt)
+    apply_deletes(db, rows)
+    return rows
+
+
+def delete_records(db: Session, ids: list):
     """
-    Delete multiple records by ID. Returns summary dict with deleted ids and failed ids.
+    Delete multiple records by ID with set-based DELETE ... WHERE id IN (...) statements,
+    chunked to stay under the database's bound-parameter limit. Returns summary dict with
+    deleted ids and failed ids.
     """
-    db = SessionLocal()
+    ids = list(dict.fromkeys(ids))
     deleted = []
-    failed = {}
 
     try:
-        for rid in ids:
-            record = db.query(WeatherRecord).filter(WeatherRecord.id == rid).first()
-            if record:
-                db.delete(record)
-                deleted.append(rid)
-            else:
-                failed[rid] = "not found"
+        for i in range(0, len(ids), DELETE_CHUNK_SIZE):
+            chunk = ids[i:i + DELETE_CHUNK_SIZE]
+            deleted.extend(row.id for row in _delete_returning(db, WeatherRecord.id.in_(chunk)))
+        invalidate_artifacts(db)
         db.commit()
+        columnar.remove(deleted)
     except Exception as e:
         db.rollback()
         # mark all as failed if transaction fails
-        for rid in ids:
-            if rid not in deleted:
-                failed[rid] = str(e)
-    finally:
-        db.close()
+        return {"deleted": [], "failed": {rid: str(e) for rid in ids}}
 
-    return {"deleted": deleted, "failed": failed}
+    found = set(deleted)
+    failed = {rid: "not found" for rid in ids if rid not in found}
+    return {"deleted": sorted(deleted), "failed": failed}
 
 
-def create_range(location: str, start_date: str, end_date: str):
+def delete_records_where(db: Session, from_id: int = None, to_id: int = None, city: str = None,
+                         before: datetime = None):
+    """
+    Range delete in a single statement: ids in [from_id, to_id], a city, and/or rows
+    created before a timestamp. At least one filter is required.
+    """
+    criteria = []
+    if from_id is not None:
+        criteria.append(WeatherRecord.id >= from_id)
+    if to_id is not None:
+        criteria.append(WeatherRecord.id <= to_id)
+    if city:
+        criteria.append(WeatherRecord.city == city)
+    if before is not None:
+        criteria.append(WeatherRecord.created_at < before)
+    if not criteria:
+        return {"error": True, "message": "Provide at least one of from_id, to_id, city or before."}
+
+    rows = _delete_returning(db, *criteria)
+    invalidate_artifacts(db)
+    db.commit()
+    columnar.remove([row.id for row in rows])
+    return {"error": False, "deleted_count": len(rows)}
+
+
+def create_range(db: Session, location: str, start_date: str, end_date: str):
     """
     Create records for each date in the range [start_date, end_date].
-    Uses the 5-day forecast as an approximation when available.
+    Uses the 5-day forecast as an approximation when available and the current weather
+    for every other date. Each upstream payload is fetched at most once per call (and
+    usually comes from the caches), all rows are built in memory and written with one
+    bulk insert, so the upstream cost does not grow with the length of the range.
     Dates must be in YYYY-MM-DD format.
     """
-    from datetime import datetime, timedelta
-    from app.services.forecast_service import get_forecast
+    started = time.perf_counter()
 
     # validate dates
     try:
@@ -109,44 +224,42 @@ def create_range(location: str, start_date: str, end_date: str):
     if sd > ed:
         return {"error": True, "message": "start_date must be <= end_date."}
 
-    # get forecast approximation
-    fc = get_forecast(location)
-    if fc.get("error"):
-        return {"error": True, "message": "Could not fetch forecast to approximate daily temps."}
-
-    forecast_map = {f["date"]: f for f in fc.get("forecast", [])}
-
-    db = SessionLocal()
-    created = 0
-    d = sd
-    while d <= ed:
-        ds = d.isoformat()
-        if ds in forecast_map:
-            temp = forecast_map[ds]["temp"]
-            desc = forecast_map[ds]["description"]
-        else:
-            # fallback: use current weather for the location as approximation
-            try:
-                import requests, os
-                url = f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={API_KEY}&units=metric"
-                res = requests.get(url)
-                if res.status_code == 200:
-                    jd = res.json()
-                    temp = jd["main"]["temp"]
-                    desc = jd["weather"][0]["description"]
-                else:
-                    temp = None
-                    desc = "unknown"
-            except Exception:
-                temp = None
-                desc = "unknown"
-
-        record = WeatherRecord(city=location, temp=temp if temp is not None else 0.0, desc=desc)
-        db.add(record)
-        created += 1
-        d = d + timedelta(days=1)
+    # range generation is bulk work: interactive lookups get upstream quota first
+    with upstream_priority(BULK):
+        # get forecast approximation
+        fc = get_forecast(location)
+        if fc.get("error"):
+            return {"error": True, "message": "Could not fetch forecast to approximate daily temps."}
 
-    db.commit()
-    db.close()
+        forecast_map = {f["date"]: f for f in fc.get("forecast", [])}
+        dates = [sd + timedelta(days=i) for i in range((ed - sd).days + 1)]
+
+        # fallback for dates outside the forecast window: current weather, fetched once
+        fallback = (0.0, "unknown")
+        if any(d.isoformat() not in forecast_map for d in dates):
+            data, _age = fetch_current_weather(location)
+            if data is not None:
+                fallback = (data["main"]["temp"], data["weather"][0]["description"])
+    fetched = time.perf_counter()
+
+    rows = []
+    for d in dates:
+        f = forecast_map.get(d.isoformat())
+        temp, desc = (f["temp"], f["description"]) if f else fallback
+        rows.append({"city": location, "temp": temp, "desc": desc})
+    built = time.perf_counter()
+
+    write_records(db, rows)
+    done = time.perf_counter()
 
-    return {"error": False, "message": f"Created {created} records for {location} between {start_date} and {end_date}."}
+    return {
+        "error": False,
+        "message": f"Created {len(rows)} records for {location} between {start_date} and {end_date}.",
+        "created": len(rows),
+        "timing_ms": {
+            "fetch": round((fetched - started) * 1000, 2),
+            "build": round((built - fetched) * 1000, 2),
+            "insert": round((done - built) * 1000, 2),
+            "total": round((done - started) * 1000, 2),
+        },
+    }
@@ -0,0 +1,45 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from app import config
+from app.utils.profiling import bind
+from app.utils.scheduler import UpstreamThrottled
+
+class LocationBatch(BaseModel):
+    """Request body for the batch endpoints; each entry is any format a single lookup accepts."""
+    locations: List[str] = Field(..., min_length=1, max_length=config.BATCH_MAX_LOCATIONS)
+
+
+# shared pool, so concurrent batches together never exceed BATCH_CONCURRENCY upstream calls
+_executor = ThreadPoolExecutor(max_workers=config.BATCH_CONCURRENCY, thread_name_prefix="batch")
+
+
+def fan_out(fn, items):
+    """
+    Run `fn(item)` for every item on the bounded batch pool and return the results
+    in input order. An item whose call raised gets the exception object instead.
+    Each call runs in a copy of the caller's context, so its upstream priority carries over.
+    """
+    futures = [_executor.submit(contextvars.copy_context().run, bind(fn), item) for item in items]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def batch_response(locations, results):
+    """Pair each location with its result dict (or an error entry for a raised exception)."""
+    out = []
+    for location, result in zip(locations, results):
+        if isinstance(result, UpstreamThrottled):
+            result = {"error": True, "message": str(result), "retry_after": round(result.retry_after, 1)}
+        elif isinstance(result, Exception):
+            result = {"error": True, "message": str(result) or type(result).__name__}
+        out.append({"location": location, **result})
+    return {"count": len(out), "results": out}
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL.
+
+    `set` also accepts an absolute `expires_at` (epoch seconds) for entries whose
+    freshness is dictated by the data itself rather than a fixed TTL. Expired entries
+    are kept for another `stale_ttl` seconds so `get_stale` can still serve them while
+    a refresh is under way.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600, stale_ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()  # key -> (value, stored_at, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            now = time.time()
+            if entry is None or entry[2] <= now:
+                if entry is not None and entry[2] + self.stale_ttl <= now:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key):
+        """Return (value, age in seconds) for `key` even if expired, within the stale window; else None."""
+        with self._lock:
+            entry = self._data.get(key)
+            now = time.time()
+            if entry is None or entry[2] + self.stale_ttl <= now:
+                return None
+            self.stale_hits += 1
+            return entry[0], now - entry[1]
+
+    def expires_in(self, key):
+        """Seconds until `key` expires (negative once expired), or None if it is not cached."""
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else entry[2] - time.time()
+
+    def set(self, key, value, ttl: float = None, expires_at: float = None):
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, now, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+        }
+
+
+FORECAST_SLOT_SECONDS = 3 * 60 * 60
+
+
+def next_slot_expiry(entries, now: float = None):
+    """
+    Return when a 3-hourly OWM forecast payload goes stale: the first slot `dt` that is
+    still in the future (OWM rolls the window forward then), or the next 3-hour boundary.
+    """
+    now = time.time() if now is None else now
+    for entry in entries:
+        if entry.get("dt", 0) > now:
+            return entry["dt"]
+    return (now // FORECAST_SLOT_SECONDS + 1) * FORECAST_SLOT_SECONDS
@@ -0,0 +1,186 @@
+"""Popularity-driven cache warmer.
+
+Every lookup is counted in a count-min sketch keyed by its normalized location, and
+the WARMER_TOP_N most frequent keys are kept as heavy hitters. A background thread
+re-fetches those entries shortly before they expire (or once evicted), so requests
+for popular locations keep hitting the cache instead of paying upstream latency after
+every expiry. Refreshes run at bulk priority and draw from their own token bucket,
+WARMER_QUOTA_SHARE of the upstream quota, on the warmer's own WARMER_WORKERS threads,
+so the warmer never crowds out real traffic.
+Counts are halved every WARMER_DECAY_INTERVAL seconds to follow shifting popularity.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import config
+from app.utils.resilience import revalidate
+from app.utils.scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class CountMinSketch:
+    """Approximate counts in a fixed depth x width table; estimates never undercount."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    def _columns(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # double hashing: one independent-enough column per row from two hashes
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key: str, count: int = 1):
+        """Count `key` and return its new estimate."""
+        columns = self._columns(key)
+        self.table[self._rows, columns] += count
+        return int(self.table[self._rows, columns].min())
+
+    def estimate(self, key: str):
+        return int(self.table[self._rows, self._columns(key)].min())
+
+    def decay(self):
+        self.table >>= 1
+
+
+class PopularityTracker:
+    """Count-min sketch plus the current top-N keys by estimated count."""
+
+    def __init__(self, top_n: int, width: int = 2048, depth: int = 4):
+        self.top_n = top_n
+        self.sketch = CountMinSketch(width, depth)
+        self._top = {}  # key -> (estimate, payload)
+        self._lock = threading.Lock()
+
+    def add(self, key: str, payload):
+        with self._lock:
+            estimate = self.sketch.add(key)
+            if key in self._top or len(self._top) < self.top_n:
+                self._top[key] = (estimate, payload)
+                return
+            coldest = min(self._top, key=lambda k: self._top[k][0])
+            if estimate > self._top[coldest][0]:
+                del self._top[coldest]
+                self._top[key] = (estimate, payload)
+
+    def decay(self):
+        with self._lock:
+            self.sketch.decay()
+            self._top = {k: (estimate >> 1, payload) for k, (estimate, payload) in self._top.items() if estimate > 1}
+
+    def top(self):
+        """[(key, estimate, payload)] hottest first."""
+        with self._lock:
+            items = [(k, estimate, payload) for k, (estimate, payload) in self._top.items()]
+        return sorted(items, key=lambda item: item[1], reverse=True)
+
+
+class CacheWarmer:
+    def __init__(self, top_n: int, interval: float, lead: float, decay_interval: float, refreshes_per_minute: float,
+                 workers: int = 2, enabled: bool = True):
+        self.enabled = enabled
+        self.popularity = PopularityTracker(top_n)
+        self.interval = interval
+        self.lead = lead
+        self.decay_interval = decay_interval
+        # None: the upstream quota is unlimited, so the warmer is too. A pass may spend at most
+        # what the share accrues over one interval, so bursts cannot eat into the shared quota
+        self.budget = None
+        if refreshes_per_minute > 0:
+            self.budget = TokenBucket(refreshes_per_minute, math.ceil(refreshes_per_minute * interval / 60))
+        self._targets = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cache-warmer-refresh")
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.over_budget = 0
+
+    def register(self, kind: str, cache, fetch):
+        """Make `kind` lookups warmable: `fetch(location, key)` refreshes `cache[key]`."""
+        self._targets[kind] = (cache, fetch)
+
+    def track(self, kind: str, key: str, location: str):
+        """Count one lookup of `location` (normalized to `key`)."""
+        if self.enabled:
+            self.popularity.add(f"{kind}:{key}", (kind, key, location))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.enabled or self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _has_budget(self):
+        return self.budget is None or self.budget.wait_time(1, time.monotonic()) == 0
+
+    def warm(self):
+        """One pass: refresh hot entries that are missing or expire within `lead` seconds."""
+        for flight_key, _estimate, (kind, key, location) in self.popularity.top():
+            cache, fetch = self._targets[kind]
+            remaining = cache.expires_in(key)
+            if remaining is not None and remaining > self.lead:
+                continue
+            if not self._has_budget():
+                self.over_budget += 1
+                return
+            # revalidate() skips keys whose refresh is already running; only started refreshes are charged
+            if revalidate(flight_key, fetch, location, key, executor=self._executor):
+                if self.budget is not None:
+                    self.budget.try_take()
+                self.refreshes += 1
+
+    def _run(self):
+        next_decay = time.monotonic() + self.decay_interval
+        while not self._stop.wait(self.interval):
+            try:
+                self.warm()
+                if time.monotonic() >= next_decay:
+                    self.popularity.decay()
+                    next_decay = time.monotonic() + self.decay_interval
+            except Exception:
+                logger.exception("Cache warmer pass failed")
+
+    def stats(self):
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "running": self.running,
+            "refreshes": self.refreshes,
+            "over_budget": self.over_budget,
+            "hot": [{"key": k, "count": estimate} for k, estimate, _payload in self.popularity.top()[:10]],
+        }
+
+
+warmer = CacheWarmer(
+    enabled=config.WARMER_ENABLED,
+    top_n=config.WARMER_TOP_N,
+    interval=config.WARMER_INTERVAL,
+    lead=config.WARMER_LEAD,
+    decay_interval=config.WARMER_DECAY_INTERVAL,
+    refreshes_per_minute=config.UPSTREAM_RATE_PER_MINUTE * config.WARMER_QUOTA_SHARE,
+    workers=config.WARMER_WORKERS,
+)
@@ -0,0 +1,97 @@
+"""Circuit breaker for OpenWeatherMap calls.
+
+After UPSTREAM_BREAKER_THRESHOLD consecutive failures (transport errors, timeouts or
+5xx answers) the breaker opens and upstream calls fail immediately with CircuitOpen
+instead of each waiting out the timeout. After UPSTREAM_BREAKER_COOLDOWN seconds one
+trial call is let through: success closes the breaker, failure re-opens it.
+"""
+import threading
+import time
+
+import httpx
+
+from app import config
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(httpx.TransportError):
+    """Raised instead of calling upstream while the breaker is open.
+
+    It is an httpx.TransportError, so callers treat it like any other failed call.
+    """
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class BreakerTransport(httpx.BaseTransport):
+    """Wraps a transport so calls matching `applies(request)` go through `breaker`."""
+
+    def __init__(self, transport: httpx.BaseTransport, breaker: CircuitBreaker, applies=lambda request: True):
+        self._transport = transport
+        self._breaker = breaker
+        self._applies = applies
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not self._applies(request):
+            return self._transport.handle_request(request)
+        if not self._breaker.allow():
+            raise CircuitOpen("Upstream circuit is open", request=request)
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_success()
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+upstream_breaker = CircuitBreaker(threshold=config.UPSTREAM_BREAKER_THRESHOLD, cooldown=config.UPSTREAM_BREAKER_COOLDOWN)
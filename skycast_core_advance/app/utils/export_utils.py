@@ -1,6 +1,10 @@
-import json, csv
+import io, itertools, json, csv
 from fpdf import FPDF
 
+EXPORT_FIELDS = ("id", "city", "temp", "desc")
+# encoders buffer rows into chunks of roughly this size before yielding
+CHUNK_SIZE = 64 * 1024
+
 def export_data(data, format_type="json", filename="export"):
     if format_type == "json":
         with open(f"{filename}.json", "w") as f:
@@ -18,3 +22,121 @@ def export_data(data, format_type="json", filename="export"):
         for item in data:
             pdf.cell(200, 10, txt=str(item), ln=True)
         pdf.output(f"{filename}.pdf")
+
+
+# Streaming encoders: take an iterable of row tuples ordered like EXPORT_FIELDS and
+# yield encoded chunks, so memory stays constant whatever the size of the history.
+
+def _chunked(pieces):
+    """Join small string pieces into ~CHUNK_SIZE chunks so each write to the socket is worthwhile."""
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def _csv_lines(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def iter_csv(rows):
+    return _chunked(_csv_lines(itertools.chain([EXPORT_FIELDS], rows)))
+
+
+def iter_ndjson(rows):
+    return _chunked(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+
+
+def iter_json(rows):
+    """A JSON array with one object per line; same content as export_data's json output."""
+    def pieces():
+        sep = "\n  "
+        for row in rows:
+            yield sep + json.dumps(dict(zip(EXPORT_FIELDS, row)))
+            sep = ",\n  "
+    return _chunked(itertools.chain(["["], pieces(), ["\n]\n"]))
+
+
+STREAM_ENCODERS = {
+    "csv": (iter_csv, "text/csv"),
+    "json": (iter_json, "application/json"),
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+}
+
+
+def write_pdf(rows, path, on_row=None):
+    """Write row tuples to a PDF at `path`, same layout as export_data; `on_row(n)` reports progress."""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    for n, row in enumerate(rows, 1):
+        pdf.cell(200, 10, txt=str(dict(zip(EXPORT_FIELDS, row))), ln=True)
+        if on_row:
+            on_row(n)
+    pdf.output(path)
+
+
+def write_stream(format_type, rows, path):
+    """Encode row tuples with the streaming encoder for `format_type` into a file."""
+    encoder, _ = STREAM_ENCODERS[format_type]
+    with open(path, "w", newline="") as f:
+        for chunk in encoder(rows):
+            f.write(chunk)
+
+
+# Columnar formats (optional dependency: pyarrow). Rows are converted to typed Arrow
+# record batches of `batch_size` rows and appended to the file one batch at a time.
+ARROW_FIELDS = EXPORT_FIELDS + ("created_at",)
+ARROW_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_arrow(format_type, rows, path, batch_size=10000, on_row=None):
+    """Write ARROW_FIELDS row tuples as Parquet (zstd) or an Arrow IPC file."""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("city", pa.string()),
+        ("temp", pa.float64()),
+        ("desc", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+    if format_type == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    written = 0
+    try:
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            columns = zip(*batch)
+            arrays = [pa.array(col, type=field.type) for col, field in zip(columns, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            written += len(batch)
+            if on_row:
+                on_row(written)
+    finally:
+        writer.close()
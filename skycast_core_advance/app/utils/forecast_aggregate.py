@@ -0,0 +1,95 @@
+"""
+Vectorized aggregation of the OWM 5-day / 3-hour forecast.
+
+The 40 slots are parsed into NumPy columns once; daily min/max/mean temperature,
+humidity, wind and the dominant condition are then computed for all days in a single
+grouped pass instead of walking the slot dicts per day.
+"""
+import numpy as np
+
+DETAILS = ("daily", "hourly")
+FORECAST_DAYS = 5
+
+
+def parse_slots(entries: list):
+    """Column arrays (dt_txt, temp, humidity, wind, description) for the forecast slots."""
+    rows = [
+        (e["dt_txt"], e["main"]["temp"], e["main"]["humidity"], e["wind"]["speed"], e["weather"][0]["description"])
+        for e in entries
+    ]
+    dt_txt, temp, humidity, wind, description = zip(*rows) if rows else ((),) * 5
+    return {
+        "dt_txt": np.array(dt_txt, dtype=str),
+        "temp": np.array(temp, dtype=float),
+        "humidity": np.array(humidity, dtype=float),
+        "wind": np.array(wind, dtype=float),
+        "description": np.array(description, dtype=str),
+    }
+
+
+def _rounded(values):
+    return np.round(values, 2).tolist()
+
+
+def daily(slots: dict, days: int = FORECAST_DAYS):
+    """Per-day aggregates for the first `days` dates (UTC, as reported in dt_txt)."""
+    if not len(slots["temp"]):
+        return []
+    # "YYYY-MM-DD HH:MM:SS" truncated to its date, then grouped
+    dates, day = np.unique(slots["dt_txt"].astype("U10"), return_inverse=True)
+    n = len(dates)
+    counts = np.bincount(day, minlength=n)
+
+    def mean(column):
+        return np.bincount(day, weights=slots[column], minlength=n) / counts
+
+    temp_min = np.full(n, np.inf)
+    temp_max = np.full(n, -np.inf)
+    wind_max = np.full(n, -np.inf)
+    np.minimum.at(temp_min, day, slots["temp"])
+    np.maximum.at(temp_max, day, slots["temp"])
+    np.maximum.at(wind_max, day, slots["wind"])
+
+    # dominant condition: most frequent description per day
+    conditions, condition = np.unique(slots["description"], return_inverse=True)
+    tally = np.zeros((n, len(conditions)), dtype=int)
+    np.add.at(tally, (day, condition), 1)
+    dominant = conditions[tally.argmax(axis=1)]
+
+    columns = zip(
+        dates.tolist(), _rounded(mean("temp")), temp_min.tolist(), temp_max.tolist(),
+        _rounded(mean("humidity")), _rounded(mean("wind")), wind_max.tolist(),
+        dominant.tolist(), counts.tolist(),
+    )
+    return [
+        {
+            "date": date,
+            "temp": temp,
+            "temp_min": lo,
+            "temp_max": hi,
+            "humidity": humidity,
+            "wind_speed": wind,
+            "wind_max": gust,
+            "description": description,
+            "slots": slot_count,
+        }
+        for date, temp, lo, hi, humidity, wind, gust, description, slot_count in columns
+    ][:days]
+
+
+def hourly(slots: dict):
+    """Every 3-hour slot as a flat record."""
+    columns = zip(
+        slots["dt_txt"].tolist(), slots["temp"].tolist(), slots["humidity"].tolist(),
+        slots["wind"].tolist(), slots["description"].tolist(),
+    )
+    return [
+        {"time": dt_txt, "temp": temp, "humidity": humidity, "wind_speed": wind, "description": description}
+        for dt_txt, temp, humidity, wind, description in columns
+    ]
+
+
+def aggregate(entries: list):
+    """Parse the payload's `list` once and return both views, keyed by detail level."""
+    slots = parse_slots(entries)
+    return {"daily": daily(slots), "hourly": hourly(slots)}
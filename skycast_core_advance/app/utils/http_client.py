@@ -0,0 +1,105 @@
+"""Shared, pooled HTTP client for OpenWeatherMap calls.
+
+Opened on app startup and closed on shutdown so every service call reuses
+keep-alive connections instead of a fresh TCP + TLS handshake per request.
+
+Requests to the OpenWeatherMap host pass through the upstream scheduler first (token
+bucket + priorities), and an OWM 429 pauses the scheduler and surfaces as
+UpstreamThrottled rather than as a failed lookup. The transport is wrapped in the
+upstream circuit breaker, so a failing OWM is not waited on call after call, and every
+call that does go out is timed for /metrics.
+"""
+import time
+
+import httpx
+
+from app import config
+from app.utils import metrics
+from app.utils.circuit_breaker import BreakerTransport, upstream_breaker
+from app.utils.scheduler import UpstreamThrottled, scheduler
+
+_client = None
+
+
+def _http2_enabled():
+    """HTTP/2 is used only when requested and the optional `h2` package is installed."""
+    if not config.UPSTREAM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _retry_after(response: httpx.Response):
+    try:
+        return max(float(response.headers.get("Retry-After", "")), 1.0)
+    except ValueError:
+        return 60.0
+
+
+def _admit(request: httpx.Request):
+    scheduler.acquire()
+
+
+def _check_quota(response: httpx.Response):
+    if response.status_code == 429:
+        retry_after = _retry_after(response)
+        scheduler.pause(retry_after)
+        raise UpstreamThrottled(retry_after)
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """Records latency, status code and in-flight count of every call for /metrics."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # "weather" / "forecast"
+        endpoint = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        status = "error"
+        started = time.perf_counter()
+        try:
+            with metrics.upstream_in_flight.track_inprogress():
+                response = self._transport.handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.observe_upstream(endpoint, status, time.perf_counter() - started)
+
+    def close(self):
+        self._transport.close()
+
+
+def get_client() -> httpx.Client:
+    """Return the shared client, creating it lazily if startup has not run."""
+    global _client
+    if _client is None or _client.is_closed:
+        transport = httpx.HTTPTransport(
+            http2=_http2_enabled(),
+            limits=httpx.Limits(
+                max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client = httpx.Client(
+            base_url=config.OPENWEATHER_BASE_URL,
+            transport=BreakerTransport(MeteredTransport(transport), upstream_breaker),
+            timeout=httpx.Timeout(config.UPSTREAM_TIMEOUT, connect=config.UPSTREAM_CONNECT_TIMEOUT),
+            event_hooks={"request": [_admit], "response": [_check_quota]},
+        )
+    return _client
+
+
+def startup():
+    get_client()
+
+
+def shutdown():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,10 @@
+def location_key(location: str):
+    """
+    Normalized cache key for a location: case-folded city / ZIP text, GPS coordinates
+    (e.g. "31.5497,74.3436") rounded to 2 decimals so near-identical inputs share an entry.
+    """
+    parts = [p.strip() for p in location.split(",")]
+    if len(parts) == 2 and all(x.replace('.', '', 1).replace('-', '', 1).isdigit() for x in parts):
+        lat, lon = map(float, parts)
+        return f"coords:{round(lat, 2)},{round(lon, 2)}"
+    return ",".join(" ".join(p.casefold().split()) for p in parts)
@@ -0,0 +1,250 @@
+"""Prometheus metrics, served in the text exposition format by GET /metrics.
+
+Instruments (counters, gauges, histograms) are updated in place by the code they
+measure: the HTTP middleware below, the upstream transport, database engine events
+and exports. Numbers other components already keep, such as the cache hit/miss
+counters, are read at scrape time by collectors registered with `REGISTRY` instead of
+being counted a second time. The exposition format is small enough that this module
+implements it directly rather than pulling in a client library.
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; spans cache hits (sub-millisecond) up to slow upstream calls and exports
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def add_collector(self, collect):
+        """`collect()` yields (name, type, help, [(labels dict, value)]) families at scrape time."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(_family(metric.name, metric.type, metric.documentation, metric.samples()))
+        for collect in collectors:
+            try:
+                for name, kind, documentation, samples in collect():
+                    samples = [(name, list(labels.items()), value) for labels, value in samples]
+                    lines.extend(_family(name, kind, documentation, samples))
+            except Exception:
+                logger.exception("Metrics collector %r failed", collect)
+        return "\n".join(lines) + "\n"
+
+
+def _family(name, kind, documentation, samples):
+    yield f"# HELP {name} {documentation}"
+    yield f"# TYPE {name} {kind}"
+    for sample_name, labels, value in samples:
+        yield f"{sample_name}{_format_labels(labels)} {_format_value(value)}"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return list(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # per-bucket counts; made cumulative when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        out = []
+        for key, counts, total, count in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                out.append((self.name + "_bucket", labels + [("le", _format_value(float(bound)))], cumulative))
+            out.append((self.name + "_sum", labels, total))
+            out.append((self.name + "_count", labels, count))
+        return out
+
+
+http_requests = Counter("skycast_http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+http_request_duration = Histogram("skycast_http_request_duration_seconds",
+                                  "Time from request start until the response body is sent.", ("method", "route"))
+http_in_flight = Gauge("skycast_http_requests_in_flight", "HTTP requests currently being handled.")
+http_in_flight.set(0)
+
+upstream_requests = Counter("skycast_upstream_requests_total", "Upstream HTTP calls by endpoint and status code.",
+                            ("endpoint", "status"))
+upstream_duration = Histogram("skycast_upstream_request_duration_seconds",
+                              "Upstream call latency until the response headers arrive.", ("endpoint",))
+upstream_in_flight = Gauge("skycast_upstream_requests_in_flight", "Upstream HTTP calls currently open.")
+upstream_in_flight.set(0)
+
+
+def _route_label(scope):
+    # the route template (/records/{record_id}), never the raw path, keeps label values bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts, latency and the in-flight gauge."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec()
+            route = _route_label(scope)
+            http_request_duration.observe(time.perf_counter() - started, method=scope["method"], route=route)
+            http_requests.inc(method=scope["method"], route=route, status=status[0])
+
+
+def observe_upstream(endpoint: str, status, seconds: float):
+    upstream_duration.observe(seconds, endpoint=endpoint)
+    upstream_requests.inc(endpoint=endpoint, status=status)
+
+
+def cache_families(caches: dict):
+    """Collector families for a {name: TTLCache} mapping."""
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    counters = (("hits", "Cache lookups answered with a fresh entry."),
+                ("misses", "Cache lookups without a fresh entry."),
+                ("stale_hits", "Expired entries served while they were refreshed."),
+                ("evictions", "Entries evicted to stay within the cache size."))
+    for field, documentation in counters:
+        yield (f"skycast_cache_{field}_total", "counter", documentation,
+               [({"cache": name}, s[field]) for name, s in stats.items()])
+    yield ("skycast_cache_entries", "gauge", "Entries currently held by the cache.",
+           [({"cache": name}, s["size"]) for name, s in stats.items()])
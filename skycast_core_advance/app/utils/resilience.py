@@ -0,0 +1,97 @@
+"""Stale-while-revalidate serving with a bounded wait for upstream calls.
+
+`serve` answers from the cache when it can. An expired entry that is still inside
+the cache's stale window is returned immediately with its age, and one background
+refresh (coalesced per key) replaces it. Only a true miss waits for OpenWeatherMap,
+and an interactive caller waits at most UPSTREAM_DEADLINE seconds. The call itself
+keeps running and fills the cache for the next request, so tail latency during
+upstream incidents is bounded by our deadline rather than by OWM's.
+
+Misses and refreshes run on separate pools, so a burst of revalidations (or the
+cache warmer, which brings its own executor) never queues ahead of a waiting caller.
+Only the single-flight leader of a miss takes a pool thread; coalesced followers
+wait on the leader's call directly.
+"""
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import config
+from app.utils.metrics import Counter
+from app.utils.profiling import bind
+from app.utils.scheduler import BULK, current_priority, upstream_priority
+from app.utils.singleflight import upstream_flight
+
+logger = logging.getLogger(__name__)
+
+_pool = ThreadPoolExecutor(max_workers=config.UPSTREAM_FETCH_WORKERS, thread_name_prefix="upstream")
+_refresh_pool = ThreadPoolExecutor(max_workers=config.UPSTREAM_REFRESH_WORKERS, thread_name_prefix="upstream-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+deadline_misses = Counter("skycast_upstream_deadline_misses_total",
+                          "Cache misses answered without data after waiting UPSTREAM_DEADLINE seconds.")
+deadline_misses.inc(0)
+
+
+def _refresh(flight_key, fn, *args):
+    try:
+        # nobody is waiting on a refresh, so it never pre-empts interactive lookups
+        with upstream_priority(BULK):
+            upstream_flight.do(flight_key, fn, *args)
+    except Exception:
+        logger.warning("Background refresh of %s failed", flight_key, exc_info=True)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(flight_key)
+
+
+def revalidate(flight_key, fn, *args, executor=None):
+    """
+    Start a background refresh on `executor` unless one is already running for `flight_key`.
+    Returns whether a refresh was started.
+    """
+    with _refreshing_lock:
+        if flight_key in _refreshing:
+            return False
+        _refreshing.add(flight_key)
+    (executor or _refresh_pool).submit(_refresh, flight_key, fn, *args)
+    return True
+
+
+def fetch_within_deadline(flight_key, fn, *args):
+    """
+    Run `fn(*args)` through the single-flight and return its result, or None when an
+    interactive caller has waited UPSTREAM_DEADLINE seconds. Bulk work waits in full.
+    """
+    if current_priority() == BULK:
+        return upstream_flight.do(flight_key, fn, *args)
+    call, leader = upstream_flight.join(flight_key)
+    if leader:
+        _pool.submit(contextvars.copy_context().run, bind(upstream_flight.lead), flight_key, call, fn, *args)
+    if not call.event.wait(config.UPSTREAM_DEADLINE):
+        deadline_misses.inc()
+        return None
+    return upstream_flight.outcome(call)
+
+
+def serve(cache, key, flight_key, fn, *args):
+    """
+    Return (value, age) for `key`: age is None for a fresh value (cached or just fetched)
+    and the entry's age in seconds when a stale one is served. `fn` fetches upstream,
+    fills `cache` and returns the value (None on failure).
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value, None
+    stale = cache.get_stale(key)
+    if stale is not None:
+        revalidate(flight_key, fn, *args)
+        return stale
+    return fetch_within_deadline(flight_key, fn, *args), None
+
+
+def stale_fields(age):
+    """Extra response fields for a payload served past its expiry."""
+    return {} if age is None else {"stale": True, "age_seconds": round(age, 1)}
@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+HISTORY_PAGE_SIZE = 50
 
 # Info card for assignment (advance app)
 INFO_LINK = "https://www.linkedin.com/school/pmaccelerator/"
@@ -62,8 +63,10 @@ async def get_weather(message: cl.Message):
             await cl.Message(content="⚠️ Please send at least one numeric ID to delete.").send()
             return
 
-        # parse comma-separated ids and ranges like 4-6
+        # parse comma-separated ids and ranges like 4-6; ranges are deleted server-side
+        # in one statement instead of being expanded into individual ids
         ids = set()
+        ranges = []
         parts = [p.strip() for p in s.split(',') if p.strip()]
         for part in parts:
             if '-' in part:
@@ -71,12 +74,7 @@ async def get_weather(message: cl.Message):
                     a, b = part.split('-', 1)
                     a_i = int(a.strip())
                     b_i = int(b.strip())
-                    if a_i <= b_i:
-                        for x in range(a_i, b_i + 1):
-                            ids.add(x)
-                    else:
-                        for x in range(b_i, a_i + 1):
-                            ids.add(x)
+                    ranges.append((min(a_i, b_i), max(a_i, b_i)))
                 except Exception:
                     # skip invalid range
                     continue
@@ -86,15 +84,16 @@ async def get_weather(message: cl.Message):
                 except Exception:
                     continue
 
-        if not ids:
+        if not ids and not ranges:
             await cl.Message(content="⚠️ No valid IDs found in your input.").send()
             return
 
         # Ask for confirmation before deleting
         cl.user_session.set("expecting_delete_id", None)
         cl.user_session.set("pending_delete_ids", sorted(ids))
+        cl.user_session.set("pending_delete_ranges", ranges)
 
-        ids_list = ", ".join(str(i) for i in sorted(ids))
+        ids_list = ", ".join([str(i) for i in sorted(ids)] + [f"{a}-{b}" for a, b in ranges])
         buttons = [
             cl.Action(name="confirm_delete", payload={"value": "confirm_delete"}, label="✅ Confirm Delete"),
             cl.Action(name="cancel_delete", payload={"value": "cancel_delete"}, label="❌ Cancel")
@@ -151,7 +150,9 @@ async def get_weather(message: cl.Message):
             if j.get("error"):
                 await cl.Message(content=f"❌ Could not create range: {j.get('message')}").send()
             else:
-                await cl.Message(content=f"✅ {j.get('message')}").send()
+                timing = j.get("timing_ms") or {}
+                took = f" ({timing['total']} ms)" if "total" in timing else ""
+                await cl.Message(content=f"✅ {j.get('message')}{took}").send()
         else:
             await cl.Message(content=f"❌ Failed to create range (status {res.status_code}).").send()
         return
@@ -214,7 +215,7 @@ async def show_forecast(action: cl.Action):
 
     lines = ["### 🗓️ 5-Day Forecast:"]
     for day in data["forecast"]:
-        lines.append(f"{day['date']} → {day['temp']} °C — {day['description'].capitalize()}")
+        lines.append(f"{day['date']} → {day['temp_min']}–{day['temp_max']} °C (avg {day['temp']}) — {day['description'].capitalize()}")
     await cl.Message(content="\n".join(lines)).send()
 
 # ----------------------------------------------------------
@@ -316,8 +317,21 @@ async def handle_export(action: cl.Action):
 # ----------------------------------------------------------
 @cl.action_callback("history")
 async def show_history(action: cl.Action):
+    await send_history_page()
+
+
+@cl.action_callback("history_more")
+async def show_more_history(action: cl.Action):
+    await send_history_page(action.payload.get("after_id"))
+
+
+async def send_history_page(after_id=None):
+    # backend pages history with a keyset cursor, so only one page is loaded at a time
+    params = {"limit": HISTORY_PAGE_SIZE}
+    if after_id is not None:
+        params["after_id"] = after_id
     async with httpx.AsyncClient() as client:
-        res = await client.get(f"{BACKEND_URL}/records")
+        res = await client.get(f"{BACKEND_URL}/records", params=params)
     data = res.json()
 
     if data.get("count") == 0:
@@ -333,6 +347,8 @@ async def show_history(action: cl.Action):
         cl.Action(name="start_update", payload={"value": "start_update"}, label="✏️ Update Record"),
         cl.Action(name="delete_record", payload={"value": "delete_record"}, label="🗑️ Delete Record")
     ]
+    if data.get("next_after_id") is not None:
+        buttons.append(cl.Action(name="history_more", payload={"after_id": data["next_after_id"]}, label="⏭️ More"))
 
     await cl.Message(content="\n".join(lines), actions=buttons).send()
 
@@ -361,45 +377,60 @@ async def delete_record(action: cl.Action):
 @cl.action_callback("confirm_delete")
 async def confirm_delete(action: cl.Action):
     pending = cl.user_session.get("pending_delete_ids") or []
-    if not pending:
+    ranges = cl.user_session.get("pending_delete_ranges") or []
+    cl.user_session.set("pending_delete_ids", None)
+    cl.user_session.set("pending_delete_ranges", None)
+    if not pending and not ranges:
         await cl.Message(content="No pending deletions.").send()
         return
 
     deleted = []
     failed = {}
-    # Use backend batch delete endpoint for efficiency
-    ids_param = ",".join(str(i) for i in pending)
+    range_counts = []
     async with httpx.AsyncClient() as client:
-        try:
-            res = await client.post(f"{BACKEND_URL}/delete_batch", params={"ids": ids_param})
-        except Exception as e:
-            await cl.Message(content=f"❌ Batch delete request failed: {e}").send()
-            cl.user_session.set("pending_delete_ids", None)
-            return
-
-        if res.status_code == 200:
+        # Use backend batch delete endpoint for efficiency
+        if pending:
+            ids_param = ",".join(str(i) for i in pending)
             try:
-                j = res.json()
-            except Exception:
-                j = None
+                res = await client.post(f"{BACKEND_URL}/delete_batch", params={"ids": ids_param})
+            except Exception as e:
+                await cl.Message(content=f"❌ Batch delete request failed: {e}").send()
+                return
 
-            if j and not j.get("error") and j.get("result"):
-                deleted = j["result"].get("deleted", [])
-                failed = j["result"].get("failed", {})
+            if res.status_code == 200:
+                try:
+                    j = res.json()
+                except Exception:
+                    j = None
+
+                if j and not j.get("error") and j.get("result"):
+                    deleted = j["result"].get("deleted", [])
+                    failed = j["result"].get("failed", {})
+                else:
+                    await cl.Message(content=f"❌ Batch delete failed: {j}").send()
+                    return
             else:
-                await cl.Message(content=f"❌ Batch delete failed: {j}").send()
-                cl.user_session.set("pending_delete_ids", None)
+                await cl.Message(content=f"❌ Batch delete failed: status {res.status_code}").send()
                 return
-        else:
-            await cl.Message(content=f"❌ Batch delete failed: status {res.status_code}").send()
-            cl.user_session.set("pending_delete_ids", None)
-            return
 
-    cl.user_session.set("pending_delete_ids", None)
+        # Each range is a single DELETE ... WHERE id BETWEEN on the backend
+        for a, b in ranges:
+            try:
+                res = await client.delete(f"{BACKEND_URL}/records", params={"from_id": a, "to_id": b})
+                j = res.json() if res.status_code == 200 else None
+            except Exception as e:
+                failed[f"{a}-{b}"] = str(e)
+                continue
+            if j and not j.get("error"):
+                range_counts.append(f"{a}-{b} ({j.get('deleted_count', 0)} records)")
+            else:
+                failed[f"{a}-{b}"] = (j or {}).get("message") or f"status {res.status_code}"
 
     parts_out = []
     if deleted:
         parts_out.append("Deleted: " + ",".join(str(i) for i in deleted))
+    if range_counts:
+        parts_out.append("Deleted ranges: " + ", ".join(range_counts))
     if failed:
         parts_out.append("Failed: " + ", ".join(f"{i} ({failed[i]})" for i in failed))
 
@@ -409,6 +440,7 @@ async def confirm_delete(action: cl.Action):
 @cl.action_callback("cancel_delete")
 async def cancel_delete(action: cl.Action):
     cl.user_session.set("pending_delete_ids", None)
+    cl.user_session.set("pending_delete_ranges", None)
     await cl.Message(content="Deletion cancelled.").send()
 
 